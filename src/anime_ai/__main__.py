@@ -35,6 +35,8 @@ def main():
     # Keep terminal window open
     os.system('cls' if os.name == 'nt' else 'clear')
     
+    ai = None
+    ui = None
     try:
         from .core import AnimeAI
         from .ui.terminal_ui import TerminalUI
@@ -63,9 +65,16 @@ def main():
     except Exception as e:
         print(f"\nAn error occurred: {e}")
         traceback.print_exc()
+    finally:
+        # Make sure debounced memory and settings writes reach the disk
+        if ai is not None:
+            ai.close()
     
     print("\nPress any key to exit...")
-    if os.name == 'nt':
+    # After Ctrl+C at a prompt its reader thread still owns the next line, so wait on that instead
+    if ui is not None and ui.wait_for_pending_input():
+        pass
+    elif os.name == 'nt':
         os.system('pause')
     else:
         input("Press Enter to exit...")
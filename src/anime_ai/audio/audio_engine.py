@@ -0,0 +1,107 @@
+"""Process-wide audio engine shared by music and speech."""
+
+import asyncio
+import io
+import threading
+import pygame
+
+FREQUENCY = 44100
+BUFFER = 1024
+
+
+class AudioEngine:
+    """Own the pygame mixer for the whole session.
+
+    Music plays on the ``pygame.mixer.music`` stream and speech on a
+    reserved voice channel, so speaking never re-initializes the mixer or
+    interrupts the music. While speech plays the music is ducked to
+    ``duck`` times its volume; it comes back ``release`` seconds after the
+    last sentence so the gaps between sentences don't make it pump. The
+    restore runs on a timer thread, because after speaking the event loop
+    usually sits blocked in ``input()`` until the next turn.
+    """
+
+    def __init__(self, duck=0.3, release=0.4):
+        self.duck = duck
+        self.release = release
+        self.music_volume = 1.0
+        self.speaking = 0
+        self.restore_timer = None
+        self.lock = threading.Lock()
+        try:
+            pygame.mixer.pre_init(FREQUENCY, -16, 2, BUFFER)
+            pygame.mixer.init()
+            pygame.mixer.set_reserved(1)
+            self.voice = pygame.mixer.Channel(0)
+            self.available = True
+        except Exception as e:
+            print(f"Warning: Could not initialize audio: {e}")
+            self.voice = None
+            self.available = False
+
+    def set_music_volume(self, volume):
+        """Set the music volume (0.0 to 1.0), applied ducked while speech plays"""
+        self.music_volume = max(0.0, min(1.0, volume))
+        self.apply_music_volume()
+
+    def apply_music_volume(self):
+        if self.available:
+            with self.lock:
+                ducked = self.speaking or self.restore_timer is not None
+                pygame.mixer.music.set_volume(self.music_volume * (self.duck if ducked else 1.0))
+
+    def restore_music(self, timer):
+        with self.lock:
+            # A newer utterance may have replaced or cancelled this timer
+            if self.restore_timer is not timer:
+                return
+            self.restore_timer = None
+        self.apply_music_volume()
+
+    async def play_voice(self, audio, volume=0.7):
+        """Play encoded audio bytes (or an audio file) on the voice channel until it ends"""
+        if not self.available:
+            return
+        source = io.BytesIO(audio) if isinstance(audio, (bytes, bytearray)) else audio
+        sound = pygame.mixer.Sound(file=source)
+        sound.set_volume(volume)
+
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Event()
+        with self.lock:
+            if self.restore_timer is not None:
+                self.restore_timer.cancel()
+                self.restore_timer = None
+            self.speaking += 1
+        self.apply_music_volume()
+        self.voice.play(sound)
+        # The mixer has no completion callback without a display, so a timer
+        # on the sound length (plus one output buffer) signals the end
+        timer = loop.call_later(sound.get_length() + BUFFER / FREQUENCY, finished.set)
+        try:
+            await finished.wait()
+        finally:
+            timer.cancel()
+            if not finished.is_set():
+                # Cancelled mid-sentence
+                self.voice.stop()
+            with self.lock:
+                self.speaking -= 1
+                restore = None
+                if not self.speaking:
+                    restore = threading.Timer(self.release, lambda: self.restore_music(restore))
+                    restore.daemon = True
+                    self.restore_timer = restore
+            if restore is not None:
+                restore.start()
+
+
+_default_engine = None
+
+
+def default_engine():
+    """The process-wide AudioEngine, created on first use"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = AudioEngine()
+    return _default_engine
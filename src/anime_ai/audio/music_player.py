@@ -2,13 +2,13 @@
 
 import os
 import pygame
+from .audio_engine import default_engine
 
 class MusicPlayer:
-    def __init__(self, settings):
+    def __init__(self, settings, engine=None):
         """Initialize the music player with settings"""
-        # Initialize pygame mixer with better audio quality
-        pygame.mixer.pre_init(44100, -16, 2, 2048)
-        pygame.mixer.init()
+        # The mixer is owned by the shared audio engine, which also ducks music under speech
+        self.engine = engine or default_engine()
         self.settings = settings
         self.current_song = None
         self.is_playing = False
@@ -56,7 +56,7 @@ class MusicPlayer:
         try:
             pygame.mixer.music.load(song_path)
             pygame.mixer.music.play(-1 if loop else 0)  # -1 means loop indefinitely
-            pygame.mixer.music.set_volume(self.settings['music_volume'])
+            self.engine.set_music_volume(self.settings['music_volume'])
             
             # Set up an event handler for song end
             pygame.mixer.music.set_endevent(pygame.USEREVENT)
@@ -105,7 +105,7 @@ class MusicPlayer:
     def set_volume(self, volume):
         """Set volume (0.0 to 1.0)"""
         self.settings['music_volume'] = max(0.0, min(1.0, volume))
-        pygame.mixer.music.set_volume(self.settings['music_volume'])
+        self.engine.set_music_volume(self.settings['music_volume'])
         
     def get_current_song_name(self):
         """Get the name of the currently playing song"""
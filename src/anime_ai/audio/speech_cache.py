@@ -0,0 +1,132 @@
+"""Content-addressed on-disk cache of synthesized speech."""
+
+import hashlib
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "speech_cache")
+AUDIO_SUFFIX = ".mp3"
+
+
+class SpeechCache:
+    """Synthesized audio keyed by hash(preprocessed text, voice, rate, pitch).
+
+    Files live under ``<cache_dir>/ab/<hash>.mp3`` and are kept in least
+    recently used order, by modification time across restarts; a hit
+    touches the file. When the total size passes ``max_bytes`` the least
+    recently used files are deleted. ``get`` and ``put`` do blocking file
+    I/O and are safe to call from worker threads, e.g. via ``asyncio.to_thread``.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Index the files left by earlier runs, oldest first"""
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if not name.endswith(AUDIO_SUFFIX):
+                        # Leftover of a write interrupted by a crash
+                        self.remove(path)
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((stat.st_mtime, name[:-len(AUDIO_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+        self.evict()
+
+    def __contains__(self, key):
+        """Whether a key is cached, without counting as a lookup"""
+        return key in self.entries
+
+    @staticmethod
+    def key(text, voice, rate, pitch):
+        """Cache key of a synthesis request; text must already be preprocessed"""
+        return hashlib.sha256("\0".join((text, voice, rate, pitch)).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + AUDIO_SUFFIX)
+
+    def get(self, key):
+        """Cached audio bytes for a key, or None on a miss"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            path = self.path(key)
+            try:
+                with open(path, 'rb') as f:
+                    audio = f.read()
+                os.utime(path)
+            except OSError:
+                # Deleted behind our back
+                self.total_bytes -= self.entries.pop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key, audio):
+        """Store audio bytes under a key, written atomically so a crash never leaves half a file"""
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.{next(self.sequence)}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not cache speech: {e}")
+            self.remove(temp_path)
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)
+            self.entries[key] = len(audio)
+            self.total_bytes += len(audio)
+            self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Delete least recently used files until the cache fits its budget"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            if key == keep:
+                break
+            self.total_bytes -= self.entries.pop(key)
+            self.remove(self.path(key))
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        """Hit/miss counters and size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'bytes': self.total_bytes
+        }
@@ -0,0 +1,152 @@
+"""Sentence-pipelined speech: synthesize the next sentences while the current one plays."""
+
+import asyncio
+import re
+import time
+
+# A sentence ends at terminal punctuation followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?。！？~♡…])\s+')
+# Shorter fragments ("Eh?", "Ah!") are spoken together with the next sentence
+MIN_SENTENCE_CHARS = 12
+
+
+def split_sentences(text):
+    """Split text into complete sentences and the unfinished rest"""
+    parts = SENTENCE_END.split(text)
+    sentences, rest = [], parts.pop()
+    current = ""
+    for part in parts:
+        current = f"{current} {part}" if current else part
+        if len(current) >= MIN_SENTENCE_CHARS:
+            sentences.append(current)
+            current = ""
+    if current:
+        rest = f"{current} {rest}" if rest else current
+    return sentences, rest
+
+
+class SpeechPipeline:
+    """Speak text one sentence at a time, in order, as soon as each is synthesized.
+
+    ``feed`` accepts text in any pieces, e.g. the deltas of a streamed
+    reply, and starts synthesizing every sentence as soon as it is
+    complete. At most ``lookahead`` sentences are being synthesized or
+    waiting to play at once; a single player task plays them in order.
+    ``synthesize(text, voice, rate, pitch)``, returning audio bytes, and
+    ``play(audio)`` default to ``TextToSpeech`` and can be replaced, e.g.
+    by a stand-in backend to measure latency.
+    """
+
+    def __init__(self, voice, rate="-5%", pitch="+0Hz", lookahead=3, synthesize=None, play=None):
+        if synthesize is None or play is None:
+            from .voice_handler import TextToSpeech
+            synthesize = synthesize or TextToSpeech.text_to_speech
+            play = play or TextToSpeech.play_audio
+        self.voice = voice
+        self.rate = rate
+        self.pitch = pitch
+        self.synthesize = synthesize
+        self.play = play
+        self.slots = asyncio.Semaphore(lookahead)
+        self.playback = asyncio.Queue()
+        self.pending = ""
+        self.sentences = 0
+        self.started = time.perf_counter()
+        self.first_audio = None
+        self.player = asyncio.ensure_future(self.play_loop())
+
+    def feed(self, text):
+        """Add text; every sentence it completes starts synthesizing right away"""
+        sentences, self.pending = split_sentences(self.pending + text)
+        for sentence in sentences:
+            self.say(sentence)
+
+    def say(self, sentence):
+        """Queue one sentence for synthesis and playback"""
+        sentence = sentence.strip()
+        if not sentence:
+            return
+        self.sentences += 1
+        # The queue holds the synthesis tasks, so playback order is the order they were queued in
+        self.playback.put_nowait(asyncio.ensure_future(self.synthesize_sentence(sentence)))
+
+    async def synthesize_sentence(self, sentence):
+        # The slot is released by the player once this sentence has been played
+        await self.slots.acquire()
+        try:
+            return await self.synthesize(sentence, self.voice, rate=self.rate, pitch=self.pitch)
+        except Exception as e:
+            print(f"Warning: Could not synthesize speech: {e}")
+            return None
+
+    async def play_loop(self):
+        while True:
+            task = await self.playback.get()
+            if task is None:
+                return
+            try:
+                audio = await task
+                if audio:
+                    if self.first_audio is None:
+                        self.first_audio = time.perf_counter() - self.started
+                    await self.play(audio)
+            finally:
+                self.slots.release()
+
+    async def finish(self):
+        """Speak the remaining text and wait until everything has been played"""
+        self.say(self.pending)
+        self.pending = ""
+        self.playback.put_nowait(None)
+        await self.player
+
+    async def cancel(self):
+        """Stop speaking and drop every queued sentence"""
+        self.player.cancel()
+        while not self.playback.empty():
+            task = self.playback.get_nowait()
+            if task is not None:
+                task.cancel()
+        try:
+            await self.player
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self):
+        """Sentences spoken and seconds from creation until the first audio started"""
+        return {'sentences': self.sentences, 'first_audio_seconds': self.first_audio}
+
+
+async def measure(text, synthesis_per_char=0.004, playback_per_char=0.06, lookahead=3):
+    """Time to first audio of whole-text vs pipelined synthesis with a stand-in backend"""
+    async def synthesize(sentence, voice, rate, pitch):
+        await asyncio.sleep(0.05 + synthesis_per_char * len(sentence))
+        return sentence
+
+    async def play(audio):
+        await asyncio.sleep(playback_per_char * len(audio))
+
+    results = {}
+    whole = SpeechPipeline("stand-in", synthesize=synthesize, play=play)
+    whole.say(text)
+    await whole.finish()
+    results['whole'] = whole.stats()
+    pipelined = SpeechPipeline("stand-in", lookahead=lookahead, synthesize=synthesize, play=play)
+    # Feed word by word, like the deltas of a streamed reply
+    for word in text.split(" "):
+        pipelined.feed(word + " ")
+        await asyncio.sleep(0.01)
+    await pipelined.finish()
+    results['pipelined'] = pipelined.stats()
+    return results
+
+
+if __name__ == "__main__":
+    sample = (
+        "Ehehe, you came back! I was starting to think you forgot about me. "
+        "Today I tried baking cookies, but they came out a little burnt. "
+        "Do you want to hear about the cat I saw on the way home? "
+        "It had the fluffiest tail ever, I almost took it home with me!"
+    )
+    for name, stats in asyncio.run(measure(sample)).items():
+        print(f"{name:10s} first audio after {stats['first_audio_seconds']:.3f}s ({stats['sentences']} sentences)")
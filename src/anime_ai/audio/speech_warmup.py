@@ -0,0 +1,82 @@
+"""Background pre-synthesis of a character's stock phrases into the speech cache."""
+
+import asyncio
+import re
+from .speech_pipeline import split_sentences
+from ..utils.text_processor import TextProcessor
+
+# 'Quoted' reactions in emotional_responses; apostrophes inside words (I'm) are not quotes
+QUOTED = re.compile(r"(?:^|(?<=[\s:,(]))'(.+?)'(?=$|[\s,.;!?)])")
+
+
+def likely_phrases(profile):
+    """Sentences a character is likely to say, split the way the speech pipeline splits replies"""
+    texts = [answer for _, answer in profile.example_responses]
+    for reaction in profile.emotional_responses:
+        texts.extend(QUOTED.findall(reaction))
+    phrases = []
+    for text in texts:
+        sentences, rest = split_sentences(text)
+        for sentence in sentences + [rest]:
+            sentence = sentence.strip()
+            if sentence and sentence not in phrases:
+                phrases.append(sentence)
+    return phrases
+
+
+class SpeechWarmup:
+    """Fill the speech cache with a character's likely phrases while nothing else is going on.
+
+    At most ``concurrency`` phrases are synthesized at once, and work waits
+    whenever ``is_busy()`` says a reply is being spoken, so a warm-up never
+    competes with a real reply. Starting a warm-up for another character
+    cancels the running one.
+    """
+
+    def __init__(self, cache, synthesize=None, concurrency=2, is_busy=None, idle_delay=0.5):
+        if synthesize is None:
+            from .voice_handler import TextToSpeech
+            synthesize = TextToSpeech.text_to_speech
+        self.cache = cache
+        self.synthesize = synthesize
+        self.concurrency = concurrency
+        self.is_busy = is_busy or (lambda: False)
+        self.idle_delay = idle_delay
+        self.task = None
+        self.synthesized = 0
+
+    def start(self, profile):
+        """Warm up the cache for a character in the background, replacing any running warm-up"""
+        self.cancel()
+        rate = profile.voice_settings.get('rate', "-5%")
+        pitch = profile.voice_settings.get('pitch', "+0Hz")
+        self.task = asyncio.ensure_future(self.warm(likely_phrases(profile), profile.voice_id, rate, pitch))
+        return self.task
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = None
+
+    async def warm(self, phrases, voice, rate, pitch):
+        """Synthesize every phrase not cached yet"""
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def warm_phrase(phrase):
+            processed = TextProcessor.preprocess_for_tts(phrase)
+            # Nothing left to say, e.g. a lone emoji
+            if not processed.strip():
+                return
+            key = self.cache.key(processed, voice, rate, pitch)
+            if key in self.cache:
+                return
+            async with slots:
+                while self.is_busy():
+                    await asyncio.sleep(self.idle_delay)
+                # Synthesized without the cache so warm-up doesn't count towards its hit rate
+                audio = await self.synthesize(phrase, voice, rate=rate, pitch=pitch)
+                if audio and key not in self.cache:
+                    await asyncio.to_thread(self.cache.put, key, audio)
+                    self.synthesized += 1
+
+        await asyncio.gather(*(warm_phrase(phrase) for phrase in phrases))
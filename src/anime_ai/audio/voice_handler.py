@@ -6,8 +6,8 @@ import pyaudio
 import wave
 from faster_whisper import WhisperModel
 import edge_tts
-from pygame import mixer
 import asyncio
+from .audio_engine import default_engine
 from ..utils.text_processor import TextProcessor
 
 class VoiceRecorder:
@@ -73,40 +73,47 @@ class VoiceRecorder:
 
 class TextToSpeech:
     @staticmethod
-    async def text_to_speech(text, voice="en-US-JennyNeural", rate="-5%", pitch="+0Hz"):
-        """Convert text to speech using edge-tts"""
+    async def text_to_speech(text, voice="en-US-JennyNeural", rate="-5%", pitch="+0Hz", cache=None):
+        """Convert text to speech using edge-tts, returning the encoded audio bytes.
+        
+        The audio is collected from the edge-tts stream in memory; with a
+        SpeechCache a hit skips synthesis and a miss is stored in it. Cache
+        file I/O runs in a worker thread so it never stalls playback.
+        """
         try:
             # Preprocess text before TTS
             processed_text = TextProcessor.preprocess_for_tts(text)
+            if not processed_text.strip():
+                # Nothing to say, e.g. a sentence that was only an emoji
+                return None
             
-            communicate = edge_tts.Communicate(processed_text, voice, rate=rate, pitch=pitch)
+            key = None
+            if cache is not None:
+                key = cache.key(processed_text, voice, rate, pitch)
+                cached = await asyncio.to_thread(cache.get, key)
+                if cached:
+                    return cached
             
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-                tmp_wav_path = tmp_file.name
+            communicate = edge_tts.Communicate(processed_text, voice, rate=rate, pitch=pitch)
+            audio = bytearray()
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    audio.extend(chunk["data"])
+            audio = bytes(audio)
             
-            await communicate.save(tmp_wav_path)
-            return tmp_wav_path
+            if cache is not None and audio:
+                await asyncio.to_thread(cache.put, key, audio)
+            return audio or None
                 
         except Exception as e:
             print(f"Error generating speech: {e}")
             return None
 
     @staticmethod
-    async def play_audio(audio_file):
-        """Play audio file using pygame mixer"""
+    async def play_audio(audio):
+        """Play encoded audio bytes (or an audio file) on the shared audio engine's voice channel"""
         try:
-            mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
-            mixer.init()
-            
-            sound = mixer.Sound(audio_file)
-            sound.set_volume(0.7)
-            channel = sound.play()
-            
-            while channel.get_busy():
-                await asyncio.sleep(0.1)
-                
-            mixer.quit()
-            
+            await default_engine().play_voice(audio, volume=0.7)
         except Exception as e:
             print(f"Audio playback failed: {e}")
-            print("Try installing: pip install pygame --upgrade") 
\ No newline at end of file
+            print("Try installing: pip install pygame --upgrade")
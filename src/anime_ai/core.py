@@ -7,10 +7,17 @@ import subprocess
 from datetime import datetime
 import openai
 from .memory.memory_manager import MemoryManager
+from .memory.sqlite_memory import SqliteMemoryManager
 from .audio.voice_handler import VoiceRecorder, TextToSpeech
 from .audio.music_player import MusicPlayer
+from .audio.speech_pipeline import SpeechPipeline
+from .audio.speech_cache import SpeechCache
+from .audio.speech_warmup import SpeechWarmup
+from .audio.audio_engine import default_engine
 from .ui.terminal_ui import TerminalUI
 from .characters import get_character, get_all_characters
+from .utils.persistence import PersistenceWriter
+from .utils.chat_client import ChatClient, HTTPX_AVAILABLE
 
 print("Initializing core module...")
 
@@ -23,7 +30,22 @@ DEFAULT_SETTINGS = {
     "voice_input_enabled": True,
     "veadotube_path": "E:/abhishek/Coding projects/Masking app/src/veadotube-mini-win-x64/veadotube-mini.exe",
     "music_volume": 0.5,  # Default music volume
-    "music_folder": "music"  # Music folder path
+    "music_folder": "music",  # Music folder path
+    "memory_backend": "json",  # "json" files or "sqlite" database
+    "semantic_memory": False,  # offline embedding retrieval for the json backend
+    "api_base": "https://openrouter.ai/api/v1",  # any OpenAI-compatible endpoint
+    "stream_responses": True,  # show replies as they are generated
+    "request_timeout": 60,  # seconds to wait for the AI service
+    "connect_timeout": 10,  # seconds to open a connection to it
+    "speech_cache_mb": 200,  # disk budget for synthesized speech, 0 disables the cache
+    "speech_warmup": True,  # pre-synthesize the character's stock phrases in the background
+    "persistence_delay": 0.5  # seconds to coalesce memory/settings writes
+}
+
+# Sent with every chat request, OpenRouter uses them to attribute the app
+CHAT_HEADERS = {
+    "HTTP-Referer": "https://github.com/",
+    "X-Title": "AnimeAI"
 }
 
 class AnimeAI:
@@ -57,6 +79,18 @@ class AnimeAI:
             print(f"Error loading settings: {e}")
             raise
 
+        # Memory and settings are written on a background thread
+        self.writer = PersistenceWriter(self.settings.get('persistence_delay', 0.5))
+
+        # Phrases the characters repeat are synthesized once and replayed from disk
+        cache_mb = self.settings.get('speech_cache_mb', DEFAULT_SETTINGS['speech_cache_mb'])
+        self.speech_cache = SpeechCache(max_bytes=cache_mb * 1024 * 1024) if cache_mb else None
+        self.speech_warmup = None
+        self.active_speech = set()
+        if self.speech_cache is not None and self.settings.get('speech_warmup', True):
+            # Yields to real replies: waits while a reply is being synthesized or played
+            self.speech_warmup = SpeechWarmup(self.speech_cache, is_busy=self.speech_busy)
+
         # Initialize music player
         print("Initializing music player...")
         self.music_player = MusicPlayer(self.settings)
@@ -81,7 +115,13 @@ class AnimeAI:
             )
             
             print("Creating MemoryManager...")
-            self.memory = MemoryManager(character=character_name)
+            if self.settings.get('memory_backend') == 'sqlite':
+                self.memory = SqliteMemoryManager(character=character_name)
+            else:
+                self.memory = MemoryManager(
+                    character=character_name, writer=self.writer,
+                    semantic=self.settings.get('semantic_memory', False)
+                )
             print("Creating VoiceRecorder...")
             self.voice_recorder = VoiceRecorder()
         except Exception as e:
@@ -89,6 +129,7 @@ class AnimeAI:
             raise
         
         # Initialize AI client
+        self.chat_client = None
         try:
             print("Initializing AI client...")
             self.initialize_ai_client()
@@ -120,12 +161,21 @@ class AnimeAI:
 
     def save_settings(self):
         """Save current settings to file"""
+        settings = dict(self.settings)
+        self.writer.schedule('settings.json', lambda: self.write_settings(settings))
+
+    def write_settings(self, settings):
+        """Write settings to disk, runs on the persistence writer thread"""
         try:
             with open('settings.json', 'w') as f:
-                json.dump(self.settings, f, indent=2)
+                json.dump(settings, f, indent=2)
         except Exception as e:
             print(f"Failed to save settings: {e}")
-            self.ui.print_fancy(f"Failed to save settings: {e}", style="red")
+
+    def close(self):
+        """Flush pending memory and settings writes before exiting"""
+        self.memory.close()
+        self.writer.close()
 
     def initialize_ai_client(self):
         """Initialize the AI client with current settings"""
@@ -134,8 +184,23 @@ class AnimeAI:
                 print("No OpenRouter token found! Please set one in settings.")
                 return
             
+            api_base = self.settings.get('api_base', DEFAULT_SETTINGS['api_base'])
+            if HTTPX_AVAILABLE:
+                # One pooled client for the whole session, so turns reuse open connections
+                if self.chat_client is None:
+                    self.chat_client = ChatClient(
+                        api_base, self.settings['openrouter_token'],
+                        timeout=self.settings.get('request_timeout', DEFAULT_SETTINGS['request_timeout']),
+                        connect_timeout=self.settings.get('connect_timeout', DEFAULT_SETTINGS['connect_timeout']),
+                        headers=CHAT_HEADERS
+                    )
+                else:
+                    self.chat_client.configure(api_base, self.settings['openrouter_token'])
+                print("Chat client ready!")
+                return
+            
             # Set up OpenAI configuration globally
-            openai.api_base = "https://openrouter.ai/api/v1"
+            openai.api_base = api_base
             openai.api_key = self.settings['openrouter_token']
             
             print("OpenAI configuration ready!")
@@ -286,6 +351,7 @@ class AnimeAI:
             
             # Update memory manager with new character
             self.memory.set_character(character_name)
+            self.warm_up_speech()
             
             # Try to play character-specific music
             if self.music_player.play_character_theme(character_name):
@@ -313,7 +379,8 @@ class AnimeAI:
                 style="bright_blue"
             )
             
-            user_input = self.ui.get_user_input("You")
+            # Read off the event loop so the speech warm-up can use the time at the prompt
+            user_input = await self.ui.get_user_input_async("You")
             
             if user_input.lower() == 'exit':
                 break
@@ -324,11 +391,31 @@ class AnimeAI:
                     continue
                 user_input = transcript
             
-            response = await self.chat_with_ai(user_input)
-            if response:
-                self.ui.print_fancy(f"{character_name}: {response}", style="bright_magenta")
-                if self.settings.get('voice_enabled'):
-                    await self.handle_voice_output(response)
+            if self.settings.get('stream_responses', True):
+                # Render the reply as it arrives and start speaking at its first complete sentence
+                speech = self.speech_pipeline() if self.settings.get('voice_enabled') else None
+                
+                def on_delta(delta):
+                    self.ui.stream_delta(delta)
+                    if speech is not None:
+                        speech.feed(delta)
+                
+                self.ui.begin_stream(f"{character_name}: ", style="bright_magenta")
+                try:
+                    response = await self.chat_with_ai(user_input, on_delta=on_delta)
+                finally:
+                    self.ui.end_stream()
+                if speech is not None:
+                    if response:
+                        await speech.finish()
+                    else:
+                        await speech.cancel()
+            else:
+                response = await self.chat_with_ai(user_input)
+                if response:
+                    self.ui.print_fancy(f"{character_name}: {response}", style="bright_magenta")
+                    if self.settings.get('voice_enabled'):
+                        await self.handle_voice_output(response)
 
     async def interactive_chat(self):
         """Main interactive chat loop"""
@@ -346,43 +433,50 @@ class AnimeAI:
             'q': 'exit'
         }
         
-        while True:
-            command = self.ui.get_user_input().lower().strip()
+        self.warm_up_speech()
+        try:
+            while True:
+                command = (await self.ui.get_user_input_async()).lower().strip()
             
-            # Convert shortcut to full command if applicable
-            command = shortcuts.get(command, command)
+                # Convert shortcut to full command if applicable
+                command = shortcuts.get(command, command)
             
-            if command == "exit":
-                self.ui.print_fancy("Goodbye! 👋", style="bright_cyan")
-                break
+                if command == "exit":
+                    self.ui.print_fancy("Goodbye! 👋", style="bright_cyan")
+                    break
                 
-            elif command == "clear":
-                os.system('cls' if os.name == 'nt' else 'clear')
-                self.ui.show_welcome_screen()
+                elif command == "clear":
+                    os.system('cls' if os.name == 'nt' else 'clear')
+                    self.ui.show_welcome_screen()
                 
-            elif command == "help":
-                self.ui.show_welcome_screen()
+                elif command == "help":
+                    self.ui.show_welcome_screen()
                 
-            elif command == "settings":
-                await self.handle_settings()
+                elif command == "settings":
+                    await self.handle_settings()
                 
-            elif command in ["character", "voice"]:
-                await self.handle_voice_settings()
+                elif command in ["character", "voice"]:
+                    await self.handle_voice_settings()
                 
-            elif command == "memory":
-                self.memory.show_memories()
+                elif command == "memory":
+                    self.memory.show_memories()
                 
-            elif command == "music":
-                await self.handle_music_menu()
+                elif command == "music":
+                    await self.handle_music_menu()
                 
-            elif command == "chat":
-                await self.handle_chat()
+                elif command == "chat":
+                    await self.handle_chat()
                 
-            else:
-                self.ui.print_fancy("Unknown command. Type 'help' to see available commands.", style="yellow")
+                else:
+                    self.ui.print_fancy("Unknown command. Type 'help' to see available commands.", style="yellow")
+        finally:
+            if self.speech_warmup is not None:
+                self.speech_warmup.cancel()
+            if self.chat_client is not None:
+                await self.chat_client.aclose()
 
-    async def chat_with_ai(self, user_input, system_prompt=None):
-        """Enhanced AI chat with memory context"""
+    async def chat_with_ai(self, user_input, system_prompt=None, on_delta=None):
+        """Enhanced AI chat with memory context, streaming text to ``on_delta`` if given"""
         if system_prompt is None:
             # Get current voice and character profile
             current_voice = self.settings.get('current_voice', 'ja-JP-NanamiNeural')
@@ -407,10 +501,18 @@ class AnimeAI:
             if relevant_memories:
                 memory_context = "\n\nPrevious relevant conversations:\n"
                 for i, memory in enumerate(relevant_memories, 1):
-                    memory_context += f"{i}. User: {memory['user']}\n   You: {memory['ai']}\n"
+                    if memory.get('level'):
+                        # Summary of older conversations, one "User: ..."/"You: ..." line per sentence
+                        summary = memory['ai'].replace("\n", "\n   ")
+                        memory_context += f"{i}. {memory['user']}:\n   {summary}\n"
+                    else:
+                        memory_context += f"{i}. User: {memory['user']}\n   You: {memory['ai']}\n"
                 memory_context += "\nUse this context naturally in your response if relevant.\n"
             
-            response = await self._get_ai_response(user_input, system_prompt + memory_context)
+            if on_delta is not None:
+                response = await self._stream_ai_response(user_input, system_prompt + memory_context, on_delta)
+            else:
+                response = await self._get_ai_response(user_input, system_prompt + memory_context)
             
             # Add to chat history and memory
             if response:
@@ -437,24 +539,19 @@ class AnimeAI:
                 self.ui.print_fancy("❌ No API token set! Please configure one in settings.", "red")
                 return None
             
+            request = self._completion_request(user_input, system_prompt)
+            if self.chat_client is not None:
+                content = await self.chat_client.complete(**request)
+                print("Successfully received response from API")
+                return content
+            
             # Ensure OpenAI is configured (redundant but safe)
-            openai.api_base = "https://openrouter.ai/api/v1"
+            openai.api_base = self.settings.get('api_base', DEFAULT_SETTINGS['api_base'])
             openai.api_key = self.settings['openrouter_token']
             
             # Use synchronous call wrapped in asyncio.to_thread for proper async handling
             def make_api_call():
-                return openai.ChatCompletion.create(
-                    model="deepseek/deepseek-chat-v3-0324:free",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_input}
-                    ],
-                    max_tokens=150,  # Limit response length
-                    headers={
-                        "HTTP-Referer": "https://github.com/",
-                        "X-Title": "AnimeAI"
-                    }
-                )
+                return openai.ChatCompletion.create(headers=CHAT_HEADERS, **request)
             
             # Run the API call in a thread to avoid blocking
             completion = await asyncio.to_thread(make_api_call)
@@ -467,6 +564,71 @@ class AnimeAI:
             self.ui.print_fancy(f"❌ Error from AI service: {e}", "red")
             return None
 
+    def _completion_request(self, user_input, system_prompt):
+        """Arguments of a chat completion call for one turn"""
+        return dict(
+            model="deepseek/deepseek-chat-v3-0324:free",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_input}
+            ],
+            max_tokens=150  # Limit response length
+        )
+
+    async def _stream_ai_response(self, user_input, system_prompt, on_delta):
+        """Stream a response, passing each piece of text to ``on_delta``, and return the full text"""
+        try:
+            if not self.settings.get('openrouter_token'):
+                self.ui.print_fancy("❌ No API token set! Please configure one in settings.", "red")
+                return None
+            
+            request = self._completion_request(user_input, system_prompt)
+            if self.chat_client is not None:
+                deltas = self.chat_client.stream(**request)
+            else:
+                deltas = self._openai_stream(request)
+            parts = []
+            async for delta in deltas:
+                parts.append(delta)
+                on_delta(delta)
+            return "".join(parts) or None
+            
+        except Exception as e:
+            print(f"Detailed error in _stream_ai_response: {str(e)}")
+            self.ui.print_fancy(f"❌ Error from AI service: {e}", "red")
+            return None
+
+    async def _openai_stream(self, request):
+        """Yield streamed deltas through the openai module, used without httpx"""
+        openai.api_base = self.settings.get('api_base', DEFAULT_SETTINGS['api_base'])
+        openai.api_key = self.settings['openrouter_token']
+        
+        # The openai 0.28 stream is a blocking iterator, so it is read on a thread
+        # and each delta is handed back to the event loop through a queue
+        loop = asyncio.get_running_loop()
+        deltas = asyncio.Queue()
+        
+        def read_stream():
+            try:
+                for chunk in openai.ChatCompletion.create(stream=True, headers=CHAT_HEADERS, **request):
+                    content = chunk['choices'][0].get('delta', {}).get('content')
+                    if content:
+                        loop.call_soon_threadsafe(deltas.put_nowait, content)
+            except Exception as e:
+                loop.call_soon_threadsafe(deltas.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(deltas.put_nowait, None)
+        
+        reader = asyncio.ensure_future(asyncio.to_thread(read_stream))
+        while True:
+            delta = await deltas.get()
+            if delta is None:
+                break
+            if isinstance(delta, Exception):
+                raise delta
+            yield delta
+        await reader
+
     async def handle_voice_input(self):
         """Handle voice input from user"""
         if not self.settings.get('voice_input_enabled'):
@@ -494,23 +656,49 @@ class AnimeAI:
     async def handle_voice_output(self, text):
         """Handle voice output to user"""
         if self.settings.get('voice_enabled'):
-            # Get current character's voice settings
-            current_voice = self.settings['current_voice']
-            character_name = next(
-                (name for name, profile in self.characters.items() 
-                 if profile.voice_id == current_voice),
-                "yuki"  # default to yuki if not found
+            # Sentences are synthesized ahead while earlier ones play
+            speech = self.speech_pipeline()
+            speech.feed(text)
+            await speech.finish()
+
+    def warm_up_speech(self):
+        """Start pre-synthesizing the current character's likely phrases into the speech cache"""
+        if self.speech_warmup is None or not self.settings.get('voice_enabled'):
+            return
+        current_voice = self.settings.get('current_voice')
+        profile = next(
+            (profile for profile in self.characters.values() if profile.voice_id == current_voice),
+            None
+        )
+        if profile is not None:
+            self.speech_warmup.start(profile)
+
+    def speech_pipeline(self):
+        """Start a speech pipeline with the current character's voice settings"""
+        current_voice = self.settings['current_voice']
+        character_name = next(
+            (name for name, profile in self.characters.items() 
+             if profile.voice_id == current_voice),
+            "yuki"  # default to yuki if not found
+        )
+        character = get_character(character_name)
+        
+        # Use character's voice settings
+        rate = character.voice_settings.get('rate', "-5%")
+        pitch = character.voice_settings.get('pitch', "+0Hz")
+        if self.speech_cache is None:
+            speech = SpeechPipeline(current_voice, rate=rate, pitch=pitch)
+        else:
+            cache = self.speech_cache
+            speech = SpeechPipeline(
+                current_voice, rate=rate, pitch=pitch,
+                synthesize=lambda text, voice, rate, pitch: TextToSpeech.text_to_speech(text, voice, rate, pitch, cache=cache)
             )
-            character = get_character(character_name)
-            
-            # Use character's voice settings
-            rate = character.voice_settings.get('rate', "-5%")
-            pitch = character.voice_settings.get('pitch', "+0Hz")
-            
-            audio_file = await TextToSpeech.text_to_speech(text, current_voice, rate=rate, pitch=pitch)
-            if audio_file:
-                await TextToSpeech.play_audio(audio_file)
-                try:
-                    os.unlink(audio_file)
-                except:
-                    pass
\ No newline at end of file
+        # Counts as busy for the warm-up until it has finished or been cancelled
+        self.active_speech.add(speech)
+        speech.player.add_done_callback(lambda _: self.active_speech.discard(speech))
+        return speech
+
+    def speech_busy(self):
+        """Whether a reply is being synthesized or played"""
+        return bool(self.active_speech) or bool(default_engine().speaking)
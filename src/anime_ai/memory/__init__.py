@@ -0,0 +1 @@
+"""Memory storage and retrieval for the AI companions."""
@@ -0,0 +1,31 @@
+"""Command line tools for memory files: ``python -m anime_ai.memory migrate|reindex|dedup``."""
+
+import argparse
+from .migrate import run, run_dedup
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m anime_ai.memory",
+        description="Maintain memory files. Stop the app before running these."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="Rewrite memory files in the current format, folding in their logs")
+    reindex = commands.add_parser("reindex", help="Migrate and recompute keywords, topics and emotions of every memory")
+    dedup = commands.add_parser("dedup", help="Merge near-duplicate memories into their oldest copy")
+    for command in (migrate, reindex, dedup):
+        command.add_argument("paths", nargs="*", help="Memory files or directories (default: the memories directory)")
+    for command in (migrate, reindex):
+        command.add_argument("--batch-size", type=int, default=1000, help="Memories classified per batch")
+    dedup.add_argument("--threshold", type=float, default=0.8, help="Minimum estimated Jaccard similarity to merge")
+    reindex.add_argument("--workers", type=int, default=None, help="Classifier processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.command == "dedup":
+        run_dedup(args.paths, args.threshold)
+        return
+    run(args.paths, reclassify=args.command == "reindex", workers=getattr(args, 'workers', None), batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
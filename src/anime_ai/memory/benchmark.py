@@ -0,0 +1,200 @@
+"""Benchmark the memory engine on seeded synthetic conversations.
+
+Run with ``python -m anime_ai.memory.benchmark [--sizes 1000 10000 100000]``.
+Each size runs in its own process so peak RSS is measured per size; the
+results are printed (or written with ``--output``) as JSON so runs from
+different commits can be compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from ..characters import CHARACTERS
+from ..utils.persistence import PersistenceWriter
+from .memory_manager import MemoryManager
+from .text_classifier import TOPIC_WORDS, EMOTION_WORDS, WORD_PATTERN
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+class ConversationGenerator:
+    """Seeded synthetic exchanges built from the character profiles.
+
+    Every exchange starts from one of the profiles' example question/answer
+    pairs and mixes in words from the profiles and the classifier's topic
+    and emotion vocabularies, so memories hit every category.
+    """
+
+    def __init__(self, seed=0, profiles=None):
+        self.random = random.Random(seed)
+        profiles = list(profiles or CHARACTERS.values())
+        self.examples = [pair for profile in profiles for pair in profile.example_responses]
+        vocabulary = set()
+        for profile in profiles:
+            for text in profile.core_personality + [a for _, a in profile.example_responses]:
+                vocabulary.update(word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 3)
+        for groups in list(TOPIC_WORDS.values()) + list(EMOTION_WORDS.values()):
+            for group in groups:
+                vocabulary.update(group)
+        self.vocabulary = sorted(vocabulary)
+
+    def words(self, low, high):
+        return " ".join(self.random.choices(self.vocabulary, k=self.random.randint(low, high)))
+
+    def exchange(self):
+        """Return one (user, ai) pair"""
+        question, answer = self.random.choice(self.examples)
+        return f"{question} {self.words(2, 8)}", f"{answer} {self.words(4, 16)}"
+
+    def query(self):
+        """Return a user message to search memories with"""
+        if self.random.random() < 0.5:
+            return self.random.choice(self.examples)[0]
+        return self.words(2, 6)
+
+
+def percentiles(samples):
+    """p50/p95 in milliseconds of a list of durations in seconds"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0, 'p50_ms': None, 'p95_ms': None}
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+    return {'count': len(ordered), 'p50_ms': rank(0.5), 'p95_ms': rank(0.95)}
+
+
+def timed(samples, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def file_bytes(memory_file):
+    base = os.path.splitext(memory_file)[0]
+    paths = [memory_file] + [base + suffix for suffix in ('.log.jsonl', '.vectors.f16', '.vectors.ids')]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def run_size(size, seed=0, operations=200, repeat=3, character="yuki", **manager_options):
+    """Time each memory operation with ``size`` memories stored"""
+    # Time the search itself, not the result cache answering repeated queries
+    manager_options.setdefault('query_cache_size', 0)
+    generator = ConversationGenerator(seed)
+    add, find, prune, load, save = [], [], [], [], []
+
+    with tempfile.TemporaryDirectory() as memory_dir:
+        # Same debounced writer the app uses, so adds are timed as they run in the chat loop
+        writer = PersistenceWriter()
+        manager = MemoryManager(character, memory_dir=memory_dir, writer=writer, **manager_options)
+        # Lift the pruning limit so the store actually grows to the requested size
+        manager.MAX_MEMORIES = size + operations
+        for _ in range(size - operations):
+            manager.add_memory(*generator.exchange())
+        for _ in range(operations):
+            timed(add, manager.add_memory, *generator.exchange())
+        for _ in range(operations):
+            timed(find, manager.find_relevant_memories, generator.query())
+        for _ in range(repeat):
+            start = time.perf_counter()
+            manager.save_memory()
+            writer.flush()
+            save.append(time.perf_counter() - start)
+        manager.close()
+        writer.close()
+        stored_bytes = file_bytes(manager.memory_file)
+        del manager
+
+        for _ in range(repeat):
+            loaded = timed(load, MemoryManager, character, memory_dir=memory_dir, **manager_options)
+            loaded.close()
+
+        # Each prune keeps 80% by importance plus the newest 20%, like the default 80/20 split
+        for _ in range(repeat):
+            count = len(loaded.memories)
+            loaded.MAX_MEMORIES = count - 1
+            loaded.KEEP_IMPORTANT = int(count * 0.8)
+            loaded.KEEP_RECENT = int(count * 0.2)
+            timed(prune, loaded.prune_memories)
+
+    return {
+        'memories': size,
+        'add_memory': percentiles(add),
+        'find_relevant_memories': percentiles(find),
+        'prune_memories': percentiles(prune),
+        'load_memory': percentiles(load),
+        'save_memory': percentiles(save),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'file_bytes': stored_bytes
+    }
+
+
+def run(sizes=DEFAULT_SIZES, seed=0, operations=200, repeat=3, semantic=False):
+    """Run every size in a fresh interpreter and collect the results"""
+    results = []
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    for size in sizes:
+        command = [
+            sys.executable, '-m', f"{__package__}.benchmark", '--single',
+            '--sizes', str(size), '--seed', str(seed),
+            '--operations', str(operations), '--repeat', str(repeat)
+        ]
+        if semantic:
+            command.append('--semantic')
+        output = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+        results.append(json.loads(output))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'semantic': semantic,
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory engine")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Memory counts to test")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the conversation generator")
+    parser.add_argument("--operations", type=int, default=200, help="Timed adds and searches per size")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed loads, saves and prunes per size")
+    parser.add_argument("--semantic", action="store_true", help="Benchmark embedding retrieval")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        report = run_size(args.sizes[0], args.seed, args.operations, args.repeat, semantic=args.semantic)
+    else:
+        report = run(args.sizes, args.seed, args.operations, args.repeat, args.semantic)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
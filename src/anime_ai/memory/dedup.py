@@ -0,0 +1,210 @@
+"""MinHash/LSH near-duplicate detection for memories."""
+
+import random
+import zlib
+from array import array
+from collections import defaultdict
+from .text_classifier import WORD_PATTERN
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Largest 32-bit prime: with 32-bit hashes and coefficients a*h+b never overflows 64 bits
+PRIME = 4294967291
+SHINGLE_SIZE = 4
+# Texts with fewer shingles ("yes", "ok!") are too short to call near-duplicates
+MIN_SHINGLES = 12
+
+
+def shingles(text):
+    """Character 4-grams of the text's lowercased words, so punctuation and spacing don't matter"""
+    normalized = " ".join(WORD_PATTERN.findall(text.lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+class DuplicateIndex:
+    """MinHash sketches of memories, banded into LSH buckets.
+
+    ``find`` only compares a text against memories sharing at least one
+    band bucket with it, so the cost does not grow with the store. With 16
+    bands of 4 rows a pair at Jaccard 0.8 becomes a candidate with
+    probability 0.9998; candidates are then checked against ``threshold``
+    with the estimated similarity. ``rebuild`` only remembers the memories;
+    they are sketched on first use, so loading a character stays cheap.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self.a = [rng.randrange(1, PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, PRIME) for _ in range(num_perm)]
+        if NUMPY_AVAILABLE:
+            self.a_vector = np.array(self.a, dtype=np.uint64)[:, None]
+            self.b_vector = np.array(self.b, dtype=np.uint64)[:, None]
+        self.clear()
+
+    def clear(self):
+        self.signatures = {}
+        self.buckets = defaultdict(set)
+        self.unindexed = None
+
+    def __len__(self):
+        self.ensure()
+        return len(self.signatures)
+
+    def ensure(self):
+        """Sketch the memories handed to rebuild, if that hasn't happened yet"""
+        memories, self.unindexed = self.unindexed, None
+        if not memories:
+            return
+        # Summaries of older memories are not small talk that can repeat
+        memories = [memory for memory in memories if memory.get('level') is None]
+        signatures = self.signatures_of([self.memory_text(memory) for memory in memories])
+        for memory, signature in zip(memories, signatures):
+            self.add(memory['id'], signature)
+
+    def signature(self, text):
+        """MinHash signature of a text, or None if it is too short to be compared"""
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)]
+        if len(hashes) < MIN_SHINGLES:
+            return None
+        if NUMPY_AVAILABLE:
+            values = (self.a_vector * np.array(hashes, dtype=np.uint64)[None, :] + self.b_vector) % PRIME
+            return array('I', values.min(axis=1).astype(np.uint32).tobytes())
+        return array('I', (min((a * h + b) % PRIME for h in hashes) for a, b in zip(self.a, self.b)))
+
+    def signatures_of(self, texts):
+        """Signatures of many texts, computed in one NumPy pass when available"""
+        if not NUMPY_AVAILABLE:
+            return [self.signature(text) for text in texts]
+        hashes = [[zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)] for text in texts]
+        long_enough = [i for i, text_hashes in enumerate(hashes) if len(text_hashes) >= MIN_SHINGLES]
+        result = [None] * len(texts)
+        if not long_enough:
+            return result
+        flat = np.fromiter((h for i in long_enough for h in hashes[i]), dtype=np.uint64)
+        starts = np.cumsum([0] + [len(hashes[i]) for i in long_enough[:-1]])
+        values = np.minimum.reduceat((self.a_vector * flat[None, :] + self.b_vector) % PRIME, starts, axis=1)
+        for i, row in zip(long_enough, values.T.astype(np.uint32)):
+            result[i] = array('I', row.tobytes())
+        return result
+
+    def band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key, signature):
+        """Index a memory under its signature"""
+        self.ensure()
+        if signature is None or key in self.signatures:
+            return
+        self.signatures[key] = signature
+        for band_key in self.band_keys(signature):
+            self.buckets[band_key].add(key)
+
+    def remove(self, key):
+        self.ensure()
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self.band_keys(signature):
+            keys = self.buckets.get(band_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.buckets[band_key]
+
+    def similarity(self, first, second):
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(first, second) if x == y) / self.num_perm
+
+    def find(self, signature):
+        """Key of the most similar indexed memory at or above the threshold, or None"""
+        if signature is None:
+            return None
+        self.ensure()
+        candidates = set()
+        for band_key in self.band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        if not candidates:
+            return None
+        keys = sorted(candidates)
+        if NUMPY_AVAILABLE:
+            # Compare against every candidate at once; small talk can share buckets with hundreds of memories
+            matrix = np.frombuffer(b"".join(self.signatures[key].tobytes() for key in keys), dtype=np.uint32)
+            query = np.frombuffer(signature.tobytes(), dtype=np.uint32)
+            matches = (matrix.reshape(len(keys), self.num_perm) == query).sum(axis=1)
+            best = int(np.argmax(matches))
+            return keys[best] if matches[best] / self.num_perm >= self.threshold else None
+        best, best_similarity = None, 0.0
+        for key in keys:
+            similarity = self.similarity(signature, self.signatures[key])
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = key, similarity
+        return best
+
+    @staticmethod
+    def exchange_text(user, ai):
+        """Text an exchange is sketched by: both sides, so a repeated "yes" with a new reply is kept"""
+        return user + " " + ai
+
+    @classmethod
+    def memory_text(cls, memory):
+        return cls.exchange_text(memory['user'], memory['ai'])
+
+    def rebuild(self, memories):
+        """Replace the contents with the given memories, sketched lazily on first use"""
+        self.clear()
+        self.unindexed = memories
+
+    def sync(self, memories):
+        """Drop every memory that is no longer in the given list"""
+        if self.unindexed is not None:
+            self.unindexed = memories
+            return
+        kept = {memory['id'] for memory in memories}
+        for key in [key for key in self.signatures if key not in kept]:
+            self.remove(key)
+
+
+def boosted_importance(importance, hits=1):
+    """Raise importance for each repeat, approaching but never reaching 1.0"""
+    for _ in range(hits):
+        importance += (1.0 - importance) * 0.1
+    return importance
+
+
+def deduplicate(memories, threshold=0.8):
+    """Merge near-duplicate memory dicts into their oldest copy.
+
+    Returns the kept memories, in their original order, and the number of
+    memories merged away.
+    """
+    index = DuplicateIndex(threshold)
+    by_id = {}
+    merged = 0
+    for memory in sorted(memories, key=lambda m: m['timestamp']):
+        if memory.get('level') is not None:
+            by_id[memory['id']] = memory
+            continue
+        signature = index.signature(DuplicateIndex.memory_text(memory))
+        duplicate = index.find(signature)
+        if duplicate is not None:
+            original = by_id[duplicate]
+            hits = memory.get('hits', 1)
+            original['hits'] = original.get('hits', 1) + hits
+            original['importance'] = boosted_importance(max(original['importance'], memory['importance']), hits)
+            merged += 1
+            continue
+        index.add(memory['id'], signature)
+        by_id[memory['id']] = memory
+    kept_ids = set(by_id)
+    return [memory for memory in memories if memory['id'] in kept_ids], merged
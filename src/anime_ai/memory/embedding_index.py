@@ -0,0 +1,302 @@
+"""Offline semantic retrieval: hashed n-gram embeddings with an IVF index."""
+
+import math
+import os
+import re
+import time
+import zlib
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class HashedEncoder:
+    """Deterministic local text encoder.
+
+    Words and their character trigrams are hashed into ``n_features``
+    buckets, weighted by log term frequency and projected to ``dim``
+    dimensions with a fixed seeded Gaussian matrix. The trigrams make
+    inflections and typos ("games"/"gaming") land close together.
+    """
+
+    def __init__(self, dim=128, n_features=2 ** 14, seed=1234):
+        self.dim = dim
+        self.n_features = n_features
+        rng = np.random.default_rng(seed)
+        self.projection = (rng.standard_normal((n_features, dim)) / math.sqrt(dim)).astype(np.float32)
+
+    def features(self, text):
+        """Hashed word and trigram features of a text with their counts"""
+        counts = {}
+        for word in WORD_PATTERN.findall(text.lower()):
+            grams = [word] if len(word) < 3 else [word] + [f" {word} "[i:i + 3] for i in range(len(word))]
+            for gram in grams:
+                feature = zlib.crc32(gram.encode('utf-8')) % self.n_features
+                counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    def encode(self, text):
+        """Unit-length float32 embedding of a text"""
+        counts = self.features(text)
+        if not counts:
+            return np.zeros(self.dim, dtype=np.float32)
+        features = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        vector = weights @ self.projection[features]
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def encode_batch(self, texts):
+        return np.vstack([self.encode(text) for text in texts]) if texts else np.empty((0, self.dim), np.float32)
+
+
+class VectorFile:
+    """Float16 vectors in a memory-mapped file, with their memory ids alongside.
+
+    Rows are only ever appended; removed rows are tombstoned with id -2 and
+    dropped when the file is compacted. Unused capacity has id -1.
+    """
+
+    def __init__(self, path, dim):
+        self.dim = dim
+        self.vector_path = path + '.f16'
+        self.id_path = path + '.ids'
+        self.count = 0
+        self.vectors = None
+        self.ids = None
+        if os.path.exists(self.vector_path) and os.path.exists(self.id_path):
+            self.open()
+        else:
+            self.resize(1024)
+
+    def open(self):
+        capacity = os.path.getsize(self.id_path) // 8
+        if capacity == 0 or os.path.getsize(self.vector_path) != capacity * self.dim * 2:
+            self.resize(1024, fresh=True)
+            return
+        self.ids = np.memmap(self.id_path, dtype=np.int64, mode='r+', shape=(capacity,))
+        self.vectors = np.memmap(self.vector_path, dtype=np.float16, mode='r+', shape=(capacity, self.dim))
+        unused = np.nonzero(self.ids == -1)[0]
+        self.count = int(unused[0]) if len(unused) else capacity
+
+    def resize(self, capacity, fresh=False):
+        """Grow the files to hold ``capacity`` rows"""
+        old = 0 if fresh or self.ids is None else len(self.ids)
+        self.close()
+        for path, item_size in ((self.id_path, 8), (self.vector_path, 2 * self.dim)):
+            with open(path, 'wb' if fresh or old == 0 else 'r+b') as f:
+                f.truncate(capacity * item_size)
+        self.ids = np.memmap(self.id_path, dtype=np.int64, mode='r+', shape=(capacity,))
+        self.vectors = np.memmap(self.vector_path, dtype=np.float16, mode='r+', shape=(capacity, self.dim))
+        self.ids[old:] = -1
+        if fresh or old == 0:
+            self.count = 0
+
+    def append(self, ids, vectors):
+        """Store vectors for the given memory ids, returning their row numbers"""
+        needed = self.count + len(ids)
+        if needed > len(self.ids):
+            self.resize(max(needed, 2 * len(self.ids)))
+        rows = np.arange(self.count, needed)
+        self.vectors[rows] = vectors
+        self.ids[rows] = ids
+        self.count = needed
+        return rows
+
+    def live_rows(self):
+        return np.nonzero(self.ids[:self.count] >= 0)[0]
+
+    def flush(self):
+        if self.ids is not None:
+            self.ids.flush()
+            self.vectors.flush()
+
+    def close(self):
+        self.flush()
+        self.ids = None
+        self.vectors = None
+
+
+class EmbeddingIndex:
+    """Approximate nearest-neighbour search over memory embeddings.
+
+    Small collections are scanned exactly. Past ``train_at`` vectors an IVF
+    index is trained with spherical k-means, with one inverted list per
+    ``list_size`` vectors; queries scan the ``nprobe`` closest lists, so the
+    work per query stays roughly constant as the collection grows. New
+    vectors go straight into their nearest list and the centroids are
+    retrained whenever the collection has doubled since the last training.
+    """
+
+    def __init__(self, path, dim=128, list_size=256, nprobe=8, train_at=4096, encoder=None):
+        self.encoder = encoder or HashedEncoder(dim)
+        self.file = VectorFile(path, self.encoder.dim)
+        self.list_size = list_size
+        self.nprobe = nprobe
+        self.train_at = train_at
+        self.centroids = None
+        self.lists = []
+        self.trained_size = 0
+        self.rows = {}
+        for row in self.file.live_rows():
+            self.rows[int(self.file.ids[row])] = int(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def memory_text(memory):
+        return memory.user + " " + memory.ai
+
+    def sync(self, memories):
+        """Make the stored vectors match the given memories exactly"""
+        wanted = {memory.id for memory in memories}
+        stale = [memory_id for memory_id in self.rows if memory_id not in wanted]
+        if stale:
+            self.remove(stale)
+        missing = [memory for memory in memories if memory.id not in self.rows]
+        if missing:
+            self.add_vectors(
+                [memory.id for memory in missing],
+                self.encoder.encode_batch([self.memory_text(memory) for memory in missing])
+            )
+        if self.centroids is None and len(self.rows) >= self.train_at:
+            self.train()
+
+    def add(self, memory):
+        """Encode and index one new memory"""
+        if memory.id not in self.rows:
+            self.add_vectors([memory.id], self.encoder.encode(self.memory_text(memory))[None, :])
+
+    def add_vectors(self, ids, vectors):
+        """Index precomputed vectors"""
+        rows = self.file.append(ids, vectors.astype(np.float16))
+        for memory_id, row in zip(ids, rows):
+            self.rows[int(memory_id)] = int(row)
+        if self.centroids is not None:
+            assignments = self.assign(vectors.astype(np.float32))
+            for row, target in zip(rows, assignments):
+                self.lists[target].append(int(row))
+        if len(self.rows) >= max(self.train_at, 2 * self.trained_size):
+            self.train()
+
+    def remove(self, ids):
+        """Tombstone the vectors of removed memories"""
+        rows = [self.rows.pop(memory_id) for memory_id in ids if memory_id in self.rows]
+        if not rows:
+            return
+        self.file.ids[rows] = -2
+        if len(self.rows) < self.file.count // 2:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the vector file without tombstoned rows"""
+        live = self.file.live_rows()
+        ids = np.array(self.file.ids[live])
+        vectors = np.array(self.file.vectors[live])
+        self.file.resize(max(1024, len(live)), fresh=True)
+        self.file.append(ids, vectors)
+        self.rows = {int(memory_id): row for row, memory_id in enumerate(ids)}
+        self.centroids = None
+        self.lists = []
+        self.trained_size = 0
+        if len(self.rows) >= self.train_at:
+            self.train()
+
+    def assign(self, vectors, chunk=65536):
+        """Nearest centroid of each vector"""
+        return np.concatenate([
+            np.argmax(vectors[i:i + chunk] @ self.centroids.T, axis=1)
+            for i in range(0, len(vectors), chunk)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def train(self, iterations=6, seed=0):
+        """Cluster the live vectors into inverted lists with spherical k-means"""
+        live = self.file.live_rows()
+        n_lists = max(1, len(live) // self.list_size)
+        rng = np.random.default_rng(seed)
+        sample_rows = live if len(live) <= 16 * n_lists else rng.choice(live, 16 * n_lists, replace=False)
+        sample = np.asarray(self.file.vectors[np.sort(sample_rows)], dtype=np.float32)
+
+        self.centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            labels = self.assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = self.centroids[empty]
+            self.centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-6)
+
+        labels = np.concatenate([
+            self.assign(np.asarray(self.file.vectors[live[i:i + 65536]], dtype=np.float32))
+            for i in range(0, len(live), 65536)
+        ])
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(n_lists + 1))
+        self.lists = [live[order[bounds[i]:bounds[i + 1]]].tolist() for i in range(n_lists)]
+        self.trained_size = len(live)
+
+    def search(self, query, k=20):
+        """Return up to ``k`` (memory id, cosine similarity) pairs, best first"""
+        if not self.rows or k <= 0:
+            return []
+        vector = self.encoder.encode(query)
+        if self.centroids is None:
+            rows = self.file.live_rows()
+        else:
+            probe = min(self.nprobe, len(self.centroids))
+            nearest = np.argpartition(-(self.centroids @ vector), probe - 1)[:probe]
+            rows = np.fromiter(
+                (row for i in nearest for row in self.lists[i]), dtype=np.int64
+            )
+            rows = rows[self.file.ids[rows] >= 0]
+        if not len(rows):
+            return []
+        similarities = np.asarray(self.file.vectors[rows], dtype=np.float32) @ vector
+        if len(rows) > k:
+            top = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-similarities[top], kind='stable')]
+        return [(int(self.file.ids[rows[i]]), float(similarities[i])) for i in top]
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def benchmark(sizes=(1000, 10000, 100000, 1000000), queries=50, dim=128):
+    """Median query latency at growing collection sizes, using random unit vectors"""
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        index = EmbeddingIndex(os.path.join(directory, 'bench'), dim=dim)
+        next_id = 0
+        for size in sizes:
+            while next_id < size:
+                batch = min(size - next_id, 100000)
+                vectors = rng.standard_normal((batch, dim)).astype(np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                index.add_vectors(np.arange(next_id, next_id + batch), vectors)
+                next_id += batch
+            timings = []
+            for i in range(queries):
+                start = time.perf_counter()
+                index.search(f"do you remember the game we played {i}", k=20)
+                timings.append(time.perf_counter() - start)
+            results[size] = sorted(timings)[len(timings) // 2] * 1000
+        index.close()
+    return results
+
+
+if __name__ == "__main__":
+    for size, latency in benchmark().items():
+        print(f"{size:>8} memories: {latency:.3f} ms/query")
@@ -0,0 +1,71 @@
+"""Inverted index over memory keywords, topics and emotions."""
+
+from collections import defaultdict
+
+
+class MemoryIndex:
+    """Map keyword/topic/emotion terms to the memories that contain them"""
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.entries = {}
+
+    @staticmethod
+    def memory_key(memory):
+        """Return the key identifying a memory inside the index"""
+        return memory.id
+
+    @staticmethod
+    def terms(keywords, topics, emotions):
+        """Build namespaced index terms so a keyword never collides with a topic"""
+        terms = {f"k:{keyword}" for keyword in keywords}
+        terms.update(f"t:{topic}" for topic in topics)
+        terms.update(f"e:{emotion}" for emotion in emotions)
+        return terms
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Return the indexed memory with the given key, if any"""
+        return self.entries.get(key)
+
+    def add(self, memory):
+        """Index a single memory"""
+        key = self.memory_key(memory)
+        self.entries[key] = memory
+        for term in self.terms(memory.keywords, memory.topics, memory.emotions):
+            self.postings[term].add(key)
+
+    def remove(self, memory):
+        """Drop a single memory from the index"""
+        key = self.memory_key(memory)
+        if self.entries.pop(key, None) is None:
+            return
+        for term in self.terms(memory.keywords, memory.topics, memory.emotions):
+            keys = self.postings.get(term)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self.postings[term]
+
+    def rebuild(self, memories):
+        """Index a full list of memories, replacing the current contents"""
+        self.postings = defaultdict(set)
+        self.entries = {}
+        for memory in memories:
+            self.add(memory)
+
+    def sync(self, memories):
+        """Remove every indexed memory that is no longer in the given list"""
+        kept = {self.memory_key(memory) for memory in memories}
+        for key in [key for key in self.entries if key not in kept]:
+            self.remove(self.entries[key])
+
+    def candidates(self, keywords, topics, emotions):
+        """Return memories sharing at least one term with the query"""
+        keys = set()
+        for term in self.terms(keywords, topics, emotions):
+            keys.update(self.postings.get(term, ()))
+        return [self.entries[key] for key in sorted(keys)]
@@ -1,135 +1,396 @@
 """Memory management functionality for the AI companions."""
 
 import os
-import json
+import time
+import hashlib
+from collections import defaultdict
 from datetime import datetime
-from difflib import SequenceMatcher
-import re
+from .memory_index import MemoryIndex
+from .relevance_scorer import RelevanceScorer, NUMPY_AVAILABLE
+if NUMPY_AVAILABLE:
+    import numpy as np
+from .memory_store import MemoryStore, replay
+from . import text_classifier
+from . import relevance_scorer
+from .state_cache import MemoryStateCache, estimate_memory_bytes
+from .memory_record import MemoryRecord
+from .query_cache import QueryCache, normalize_query
+from .embedding_index import EmbeddingIndex, HashedEncoder
+from .time_index import TimeIndex, parse_time_window, is_recall_question
+from .dedup import DuplicateIndex, boosted_importance
+from .summarizer import SUMMARY_LENGTHS, ROLLUPS, summarize, summary_lines, period_start, summary_title
+
+CATEGORY_NAMES = ('personal', 'emotions', 'activities', 'time', 'location')
+
+# Per-character attributes swapped in and out by set_character
+STATE_ATTRIBUTES = ('memory_file', 'store', 'memories', 'categories', 'next_id',
+                    'index', 'time_index', 'duplicates', 'scorer', 'embeddings', 'resident_bytes')
+
+DEFAULT_MEMORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "memories")
+
+
+def memory_path(memory_dir, character, user_id=None):
+    """Memory file of a character, namespaced per user when a user id is given.
+
+    Users live under two levels of hashed subdirectories
+    (``users/ab/cd/<hash>/``) so no directory grows past a few hundred
+    entries however many users there are. Without a user id the legacy
+    ``<character>_memory.json`` next to the other files is used.
+    """
+    if user_id is None:
+        return os.path.join(memory_dir, f"{character}_memory.json")
+    digest = hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()
+    return os.path.join(memory_dir, "users", digest[:2], digest[2:4], digest, f"{character}_memory.json")
 
 class MemoryManager:
-    def __init__(self, character="yuki"):
+    # Pruning limits: above MAX_MEMORIES exchanges keep the most important and the most recent ones
+    MAX_MEMORIES = 100
+    KEEP_IMPORTANT = 80
+    KEEP_RECENT = 20
+    
+    def __init__(self, character="yuki", use_index=True, vectorized=True, persistence="log",
+                 cache_characters=4, cache_bytes=64 * 1024 * 1024, writer=None, query_cache_size=128,
+                 user_id=None, memory_dir=None, semantic=False, dedup=True, compaction=True):
         self.character = character
+        self.user_id = user_id
+        # "log" appends each change to a JSONL log, "snapshot" rewrites the whole file
+        self.persistence = persistence
+        # Optional PersistenceWriter doing the disk I/O off the chat loop
+        self.writer = writer
+        # Only score memories that share a keyword, topic or emotion with the query
+        self.use_index = use_index
+        self.index = MemoryIndex()
+        # Memories sorted by time, for queries like "what did we talk about yesterday"
+        self.time_index = TimeIndex()
+        # Repeated small talk is merged into the earlier memory instead of stored again
+        self.dedup = dedup
+        self.duplicates = DuplicateIndex() if dedup else None
+        # Pruned memories are folded into day/week/month summaries instead of being forgotten
+        self.compaction = compaction
+        # Batched NumPy scoring, falls back to the per-memory loop without NumPy
+        self.vectorized = vectorized and NUMPY_AVAILABLE
+        self.scorer = RelevanceScorer() if self.vectorized else None
+        # Offline embedding retrieval through an ANN index, needs NumPy as well
+        self.semantic = semantic and NUMPY_AVAILABLE
+        self.encoder = HashedEncoder() if self.semantic else None
+        self.embeddings = None
+        # Recently used characters stay loaded so switching back is instant
+        self.state_cache = MemoryStateCache(
+            cache_characters, cache_bytes, on_evict=self.flush_state, background=writer is None
+        )
+        # Repeated queries reuse their results until the memories change (generation bump)
+        self.query_cache = QueryCache(query_cache_size)
+        self.generation = 0
         # Create memory directory if it doesn't exist
-        self.memory_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "memories")
-        os.makedirs(self.memory_dir, exist_ok=True)
-        self.memory_file = os.path.join(self.memory_dir, f"{character}_memory.json")
+        self.memory_dir = memory_dir or DEFAULT_MEMORY_DIR
+        self.memory_file = memory_path(self.memory_dir, character, user_id)
+        os.makedirs(os.path.dirname(self.memory_file), exist_ok=True)
+        self.store = MemoryStore(self.memory_file)
+        self.embeddings = self.open_embeddings()
         self.memories = []
-        self.categories = {
-            'personal': [],
-            'emotions': [],
-            'activities': [],
-            'time': [],
-            'location': []
-        }
+        # Categories hold memory ids, each memory itself is stored once
+        self.categories = {name: set() for name in CATEGORY_NAMES}
+        self.next_id = 1
+        self.resident_bytes = 0
         self.load_memory()
     
     def set_character(self, character):
-        """Change the current character and load their memories"""
-        if self.character != character:
-            self.save_memory()  # Save current character's memories
-            self.character = character
-            self.memory_file = os.path.join(self.memory_dir, f"{character}_memory.json")
+        """Change the current character, reusing their memories if still loaded"""
+        if self.character == character:
+            return
+        self.generation += 1
+        # Every change is already on disk (log or snapshot), so the old state can just be parked
+        self.state_cache.put(self.character, self.capture_state(), self.resident_bytes)
+        self.character = character
+        
+        state = self.state_cache.pop(character)
+        if state is not None:
+            self.restore_state(state)
+            return
+        
+        # Wait for a background flush of this character so we never read a half-compacted store
+        self.state_cache.wait(character)
+        if self.writer is not None:
+            self.writer.flush()
+        self.memory_file = memory_path(self.memory_dir, character, self.user_id)
+        self.store = MemoryStore(self.memory_file)
+        self.index = MemoryIndex()
+        self.time_index = TimeIndex()
+        self.duplicates = DuplicateIndex() if self.dedup else None
+        self.scorer = RelevanceScorer() if self.vectorized else None
+        self.embeddings = self.open_embeddings()
         self.load_memory()
     
+    def open_embeddings(self):
+        """Open the character's memory-mapped embedding index in semantic mode"""
+        if not self.semantic:
+            return None
+        return EmbeddingIndex(os.path.splitext(self.memory_file)[0] + ".vectors", encoder=self.encoder)
+    
+    def capture_state(self):
+        """Bundle the current character's loaded memories"""
+        return {name: getattr(self, name) for name in STATE_ATTRIBUTES}
+    
+    def restore_state(self, state):
+        """Make a previously captured character state current"""
+        for name in STATE_ATTRIBUTES:
+            setattr(self, name, state[name])
+    
+    def flush_state(self, character, state):
+        """Fold an evicted character's log into their snapshot, on the writer or a background thread"""
+        store = state['store']
+        embeddings = state['embeddings']
+        if self.writer is not None:
+            if store.has_pending():
+                store.queue_snapshot(self.snapshot_data(character, list(state['memories']), state['categories']))
+
+            def flush():
+                if embeddings is not None:
+                    embeddings.flush()
+                store.flush()
+
+            # Same key as request_flush, so a pending log write of this character is folded in
+            self.writer.schedule(store.snapshot_file, flush)
+            return
+        if embeddings is not None:
+            embeddings.flush()
+        if not store.has_pending():
+            return
+        try:
+            store.queue_snapshot(self.snapshot_data(character, state['memories'], state['categories']))
+            store.flush()
+        except Exception as e:
+            print(f"Warning: Could not save memory for {character}: {e}")
+    
     def load_memory(self):
-        """Load memories from JSON file"""
+        """Load memories from the JSON snapshot and replay the log written after it"""
+        migrated = False
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.memories = data.get('memories', [])
-                    self.categories = data.get('categories', self.categories)
+            data, records = self.store.load()
+            self.memories = replay(data.get('memories', []), records)
+            migrated = self.assign_ids()
+            for memory in self.memories:
+                # Recency is computed at query time and no longer stored
+                if memory.pop('recency_score', None) is not None:
+                    migrated = True
+            categories = data.get('categories', {})
+            # Old files stored a full copy of the memory in every matching category
+            legacy_categories = any(
+                not isinstance(memory_id, int) for ids in categories.values() for memory_id in ids
+            )
+            migrated = migrated or legacy_categories
+            self.memories = [MemoryRecord.from_dict(memory) for memory in self.memories]
+            if records or migrated:
+                self.rebuild_categories()
+            else:
+                self.categories = {name: set(categories.get(name, [])) for name in CATEGORY_NAMES}
         except Exception as e:
             print(f"Warning: Could not load memory file for {self.character}: {e}")
             self.memories = []
-            self.categories = {
-                'personal': [],
-                'emotions': [],
-                'activities': [],
-                'time': [],
-                'location': []
-            }
+            self.next_id = 1
+            self.categories = {name: set() for name in CATEGORY_NAMES}
+        self.resident_bytes = sum(estimate_memory_bytes(memory) for memory in self.memories)
+        self.index.rebuild(self.memories)
+        self.time_index.rebuild(self.memories)
+        if self.duplicates is not None:
+            self.duplicates.rebuild(self.memories)
+        if self.scorer is not None:
+            self.scorer.rebuild(self.memories)
+        if self.embeddings is not None:
+            # Vectors are deterministic, so any memory missing from the file is simply re-encoded
+            self.embeddings.sync(self.memories)
+        if migrated:
+            # Write the migrated file once so every memory is stored exactly once
+            self.save_memory()
+    
+    def assign_ids(self):
+        """Give stable ids to memories loaded from files that predate them"""
+        self.next_id = max((m['id'] for m in self.memories if 'id' in m), default=0) + 1
+        migrated = False
+        for memory in self.memories:
+            if 'id' not in memory:
+                memory['id'] = self.next_id
+                self.next_id += 1
+                migrated = True
+        return migrated
+    
+    def rebuild_categories(self):
+        """Recompute the category id sets from the memories' topics"""
+        self.categories = {name: set() for name in CATEGORY_NAMES}
+        for memory in self.memories:
+            self.categorize_memory(memory)
+    
+    def get_category(self, category):
+        """Return the memories filed under a category"""
+        memories = (self.index.get(memory_id) for memory_id in sorted(self.categories.get(category, ())))
+        return [memory for memory in memories if memory is not None]
+    
+    def snapshot_data(self, character, memories, categories):
+        """Build the JSON document written to a character's memory file"""
+        return {
+            'memories': memories,
+            'categories': {name: sorted(ids) for name, ids in categories.items()},
+            'last_updated': datetime.now().isoformat(),
+            'character': character
+        }
     
     def save_memory(self):
         """Save memories to JSON file"""
+        # Copy the list so the writer thread never sees it change mid-dump
+        self.store.queue_snapshot(self.snapshot_data(self.character, list(self.memories), self.categories))
+        self.request_flush()
+    
+    def append_memory_log(self, memory, removed, summaries=()):
+        """Append a new memory, any pruned ones and new summaries to the log, compacting when it grows"""
+        records = [{'op': 'add', 'memory': memory}]
+        if removed:
+            records.append({'op': 'remove', 'keys': [m.id for m in removed]})
+        records.extend({'op': 'add', 'memory': summary} for summary in summaries)
+        self.store.queue(*records)
+        if self.store.needs_compaction():
+            self.save_memory()
+        else:
+            self.request_flush()
+    
+    def request_flush(self):
+        """Write queued changes now, or hand them to the background writer"""
+        store = self.store
+        if self.writer is not None:
+            self.writer.schedule(store.snapshot_file, store.flush)
+            return
         try:
-            data = {
-                'memories': self.memories,
-                'categories': self.categories,
-                'last_updated': datetime.now().isoformat(),
-                'character': self.character
-            }
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            store.flush()
         except Exception as e:
             print(f"Warning: Could not save memory for {self.character}: {e}")
     
+    def close(self):
+        """Flush the current and every cached character to disk"""
+        self.state_cache.close()
+        if self.embeddings is not None:
+            self.embeddings.flush()
+        if self.writer is not None:
+            self.writer.flush()
+    
     def add_memory(self, user_input, ai_response):
         """Add a new memory with enhanced categorization"""
-        # Extract topics and emotions
-        topics = self.extract_topics(user_input + " " + ai_response)
-        emotions = self.detect_emotions(user_input + " " + ai_response)
+        signature = None
+        if self.duplicates is not None:
+            signature = self.duplicates.signature(DuplicateIndex.exchange_text(user_input, ai_response))
+            duplicate = self.index.get(self.duplicates.find(signature))
+            if duplicate is not None:
+                self.merge_duplicate(duplicate)
+                return
+        
+        # Extract topics, emotions and keywords
+        topics, emotions, keywords = self.classify(user_input + " " + ai_response)
         
         # Calculate importance score
         importance = self.calculate_importance(user_input, ai_response, topics, emotions)
         
-        memory = {
-            'user': user_input,
-            'ai': ai_response,
-            'timestamp': datetime.now().isoformat(),
-            'keywords': self.extract_keywords(user_input + " " + ai_response),
-            'topics': topics,
-            'emotions': emotions,
-            'importance': importance,
-            'recency_score': 1.0  # New memories get highest recency score
-        }
+        memory = MemoryRecord.create(
+            self.next_id, user_input, ai_response, datetime.now().isoformat(),
+            keywords, topics, emotions, importance
+        )
         
-        # Update recency scores for all memories
-        self.update_recency_scores()
+        self.next_id += 1
+        self.generation += 1
         
         # Add to memories and categorize
+        self.track_memory(memory)
+        if self.duplicates is not None:
+            self.duplicates.add(memory.id, signature)
+        
+        # Keep only most important and recent memories, summarizing the rest
+        removed = self.prune_memories()
+        summaries = []
+        if removed and self.compaction:
+            summaries, replaced = self.compact_memories(removed)
+            removed += replaced
+        
+        if self.persistence == "log":
+            self.append_memory_log(memory, removed, summaries)
+        else:
+            self.save_memory()
+    
+    def track_memory(self, memory):
+        """Add a memory to the list, its categories and every index"""
         self.memories.append(memory)
+        self.resident_bytes += estimate_memory_bytes(memory)
         self.categorize_memory(memory)
+        self.index.add(memory)
+        self.time_index.add(memory)
+        if self.scorer is not None:
+            self.scorer.add(memory)
+        if self.embeddings is not None:
+            self.embeddings.add(memory)
+    
+    def merge_duplicate(self, memory):
+        """Count a repeat of an existing memory instead of storing it again"""
+        memory.hits += 1
+        memory.importance = boosted_importance(memory.importance)
+        self.generation += 1
+        if self.scorer is not None:
+            self.scorer.update(memory)
+        if self.persistence == "log":
+            self.store.queue({'op': 'update', 'id': memory.id,
+                              'fields': {'hits': memory.hits, 'importance': memory.importance}})
+            if self.store.needs_compaction():
+                self.save_memory()
+            else:
+                self.request_flush()
+        else:
+            self.save_memory()
+    
+    def find_relevant_memories(self, query, limit=5, full_scan=False, vectorized=None):
+        """Find memories relevant to the current query, reusing cached results"""
+        if not self.memories:
+            return []
         
-        # Keep only most important and recent memories
-        self.prune_memories()
+        key = (self.generation, normalize_query(query), limit, full_scan, vectorized)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return list(cached)
         
-        self.save_memory()
+        start = time.perf_counter()
+        result = self.search_memories(query, limit, full_scan, vectorized)
+        self.query_cache.put(key, result, time.perf_counter() - start)
+        return list(result)
+    
+    def cache_stats(self):
+        """Hit/miss counters of the retrieval result cache"""
+        return self.query_cache.stats()
     
-    def find_relevant_memories(self, query, limit=5):
+    def search_memories(self, query, limit=5, full_scan=False, vectorized=None):
         """Find memories relevant to the current query with enhanced scoring"""
-        if not self.memories:
-            return []
         
         # Calculate similarity scores with multiple factors
         scored_memories = []
-        query_topics = self.extract_topics(query)
-        query_emotions = self.detect_emotions(query)
+        query_topics, query_emotions, query_keywords = self.classify(query)
         
-        for memory in self.memories:
-            # Text similarity (40% weight)
-            text_similarity = max(
-                SequenceMatcher(None, query.lower(), memory['user'].lower()).ratio(),
-                SequenceMatcher(None, query.lower(), memory['ai'].lower()).ratio()
-            )
-            
-            # Topic similarity (30% weight)
-            topic_similarity = self.calculate_topic_similarity(query_topics, memory['topics'])
-            
-            # Emotion similarity (20% weight)
-            emotion_similarity = self.calculate_emotion_similarity(query_emotions, memory['emotions'])
-            
-            # Memory importance and recency (10% weight)
-            importance_score = (memory['importance'] + memory['recency_score']) / 2
-            
-            # Calculate final score
-            final_score = (
-                text_similarity * 0.4 +
-                topic_similarity * 0.3 +
-                emotion_similarity * 0.2 +
-                importance_score * 0.1
-            )
-            
+        window = parse_time_window(query)
+        if window is not None:
+            found = self.memories_in_window(query, query_topics, query_emotions, window, limit, vectorized)
+            # Nothing relevant in the window: the time was just mentioned, search everything
+            if found:
+                return found
+        
+        if self.embeddings is not None and not full_scan:
+            return self.semantic_memories(query, query_topics, query_emotions, limit)
+        
+        if full_scan or not self.use_index:
+            candidates = None
+        else:
+            # Only memories sharing at least one term with the query can score well
+            candidates = self.index.candidates(query_keywords, query_topics, query_emotions)
+        
+        if vectorized is None:
+            vectorized = self.scorer is not None
+        if vectorized and self.scorer is not None:
+            rows = None if candidates is None else self.scorer.rows_for(candidates)
+            return self.scorer.top_memories(query, query_topics, query_emotions, limit=limit, rows=rows)
+        
+        for memory in self.memories if candidates is None else candidates:
+            final_score = self.score_memory(query, memory, query_topics, query_emotions)
             if final_score > 0.2:  # Lower threshold to include more relevant memories
                 scored_memories.append((memory, final_score))
         
@@ -137,97 +398,77 @@ class MemoryManager:
         scored_memories.sort(key=lambda x: x[1], reverse=True)
         return [memory for memory, _ in scored_memories[:limit]]
     
-    def extract_keywords(self, text):
-        """Extract important keywords from text"""
-        # Remove special characters and convert to lowercase
-        text = re.sub(r'[^\w\s]', '', text.lower())
-        words = text.split()
-        
-        # Common words to filter out
-        common_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-            'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'shall',
-            'should', 'can', 'could', 'may', 'might', 'must', 'i', 'you', 'he',
-            'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'
-        }
+    def memories_in_window(self, query, query_topics, query_emotions, window, limit=5, vectorized=None):
+        """Rank only the memories inside a time window parsed from the query.
+        
+        The usual 0.2 threshold applies, except for recall questions like
+        "what did we talk about yesterday?", where being in the window is
+        what makes a memory relevant and the score just orders them.
+        """
+        threshold = -1.0 if is_recall_question(query) else 0.2
+        memories = [self.index.get(key) for key in self.time_index.between(*window)]
+        memories = [memory for memory in memories if memory is not None]
+        if vectorized is None:
+            vectorized = self.scorer is not None
+        if vectorized and self.scorer is not None:
+            rows = self.scorer.rows_for(memories)
+            return self.scorer.top_memories(query, query_topics, query_emotions, limit=limit, rows=rows, threshold=threshold)
+        scored_memories = [(memory, self.score_memory(query, memory, query_topics, query_emotions)) for memory in memories]
+        scored_memories = [(memory, score) for memory, score in scored_memories if score > threshold]
+        scored_memories.sort(key=lambda x: x[1], reverse=True)
+        return [memory for memory, _ in scored_memories[:limit]]
+    
+    def semantic_memories(self, query, query_topics, query_emotions, limit=5):
+        """Rank the nearest neighbours of the query embedding with the usual weighting"""
+        scored_memories = []
+        for memory_id, similarity in self.embeddings.search(query, k=max(4 * limit, 20)):
+            memory = self.index.get(memory_id)
+            if memory is None:
+                continue
+            final_score = self.score_memory(query, memory, query_topics, query_emotions, max(similarity, 0.0))
+            if final_score > 0.2:
+                scored_memories.append((memory, final_score))
+        scored_memories.sort(key=lambda x: x[1], reverse=True)
+        return [memory for memory, _ in scored_memories[:limit]]
+    
+    def score_memory(self, query, memory, query_topics, query_emotions, text_similarity=None):
+        """Score a single memory against the query"""
+        # Text similarity (40% weight)
+        if text_similarity is None:
+            text_similarity = relevance_scorer.text_similarity(query.lower(), memory)
+        
+        # Topic similarity (30% weight)
+        topic_similarity = self.calculate_topic_similarity(query_topics, memory['topics'])
+        
+        # Emotion similarity (20% weight)
+        emotion_similarity = self.calculate_emotion_similarity(query_emotions, memory['emotions'])
         
-        # Extract meaningful words and phrases
-        keywords = []
-        for i, word in enumerate(words):
-            if word not in common_words and len(word) > 3:
-                keywords.append(word)
-                # Add two-word phrases
-                if i < len(words) - 1:
-                    phrase = f"{word} {words[i+1]}"
-                    if len(phrase) > 6:
-                        keywords.append(phrase)
+        # Memory importance and recency (10% weight)
+        importance_score = (memory.importance + self.recency_score(memory)) / 2
         
-        return list(set(keywords))  # Remove duplicates
+        # Calculate final score
+        return (
+            text_similarity * 0.4 +
+            topic_similarity * 0.3 +
+            emotion_similarity * 0.2 +
+            importance_score * 0.1
+        )
+    
+    def extract_keywords(self, text):
+        """Extract important keywords from text"""
+        return text_classifier.keywords_from_lowered(text.lower())
     
     def extract_topics(self, text):
         """Extract topics from text"""
-        topics = []
-        text = text.lower()
-        
-        # Personal topics
-        personal_patterns = [
-            r'\b(i|me|my|mine|you|your|yours|we|us|our|ours)\b',
-            r'\b(name|age|birthday|family|friend|home|work|school)\b'
-        ]
-        
-        # Activity topics
-        activity_patterns = [
-            r'\b(play|work|study|read|write|draw|paint|sing|dance|cook|eat|sleep)\b',
-            r'\b(game|movie|music|book|art|sport|exercise|travel)\b'
-        ]
-        
-        # Time topics
-        time_patterns = [
-            r'\b(today|tomorrow|yesterday|morning|afternoon|evening|night)\b',
-            r'\b(week|month|year|hour|minute|second|time|date)\b'
-        ]
-        
-        # Location topics
-        location_patterns = [
-            r'\b(home|school|work|office|park|beach|city|town|country)\b',
-            r'\b(room|house|building|street|road|place|location)\b'
-        ]
-        
-        # Check each category
-        if any(re.search(pattern, text) for pattern in personal_patterns):
-            topics.append('personal')
-        if any(re.search(pattern, text) for pattern in activity_patterns):
-            topics.append('activities')
-        if any(re.search(pattern, text) for pattern in time_patterns):
-            topics.append('time')
-        if any(re.search(pattern, text) for pattern in location_patterns):
-            topics.append('location')
-            
-        return topics
+        return text_classifier.topics_and_emotions(text.lower())[0]
     
     def detect_emotions(self, text):
         """Detect emotions in text"""
-        emotions = []
-        text = text.lower()
-        
-        # Emotion patterns
-        emotion_patterns = {
-            'happy': [r'\b(happy|joy|excited|glad|cheerful|delighted|pleased)\b',
-                     r'\b(smile|laugh|fun|great|wonderful|amazing|awesome)\b'],
-            'sad': [r'\b(sad|unhappy|depressed|down|blue|miserable|gloomy)\b',
-                   r'\b(cry|tear|upset|disappointed|sorry|regret)\b'],
-            'angry': [r'\b(angry|mad|furious|annoyed|irritated|upset|frustrated)\b',
-                     r'\b(hate|dislike|terrible|awful|horrible)\b'],
-            'neutral': [r'\b(okay|fine|alright|normal|usual|regular|typical)\b']
-        }
-        
-        # Check each emotion
-        for emotion, patterns in emotion_patterns.items():
-            if any(re.search(pattern, text) for pattern in patterns):
-                emotions.append(emotion)
-                
-        return emotions if emotions else ['neutral']
+        return text_classifier.topics_and_emotions(text.lower())[1]
+    
+    def classify(self, text):
+        """Extract topics, emotions and keywords from text in one pass"""
+        return text_classifier.classify(text)
     
     def calculate_importance(self, user_input, ai_response, topics, emotions):
         """Calculate importance score for a memory"""
@@ -265,46 +506,129 @@ class MemoryManager:
         common_emotions = set(query_emotions) & set(memory_emotions)
         return len(common_emotions) / max(len(query_emotions), len(memory_emotions))
     
-    def update_recency_scores(self):
-        """Update recency scores for all memories"""
-        current_time = datetime.now()
-        for memory in self.memories:
-            memory_time = datetime.fromisoformat(memory['timestamp'])
-            hours_old = (current_time - memory_time).total_seconds() / 3600
-            
-            # Exponential decay: newer memories have higher scores
-            memory['recency_score'] = max(0.1, 1.0 * (0.95 ** hours_old))
+    def memory_epoch(self, memory):
+        """Return the memory's timestamp in epoch seconds"""
+        return memory.epoch
+    
+    def recency_score(self, memory, now=None):
+        """Exponential decay: newer memories have higher scores"""
+        now = datetime.now().timestamp() if now is None else now
+        hours_old = (now - self.memory_epoch(memory)) / 3600
+        return max(0.1, 1.0 * (0.95 ** hours_old))
+    
+    def recency_scores(self, memories, now=None):
+        """Recency scores for many memories at once"""
+        now = datetime.now().timestamp() if now is None else now
+        if not NUMPY_AVAILABLE:
+            return [self.recency_score(memory, now) for memory in memories]
+        epochs = np.fromiter((memory.epoch for memory in memories), dtype=np.float64, count=len(memories))
+        return np.maximum(0.1, 0.95 ** ((now - epochs) / 3600))
     
     def categorize_memory(self, memory):
         """Categorize memory into appropriate categories"""
-        for topic in memory['topics']:
+        for topic in memory.topics:
             if topic in self.categories:
-                self.categories[topic].append(memory)
+                self.categories[topic].add(memory.id)
     
     def prune_memories(self):
-        """Prune memories to keep only the most important and recent ones"""
-        if len(self.memories) <= 100:  # Keep all if under limit
-            return
+        """Prune exchanges to keep only the most important and recent ones, returning the dropped ones.
+        
+        Summaries are not counted against MAX_MEMORIES; their number is kept
+        down by rolling them up (see compact_memories).
+        """
+        exchanges = [memory for memory in self.memories if memory.level is None]
+        if len(exchanges) <= self.MAX_MEMORIES:  # Keep all if under limit
+            return []
             
-        # Sort memories by importance and recency
-        self.memories.sort(key=lambda x: (x['importance'] + x['recency_score']) / 2, reverse=True)
+        # Rank memories by importance and recency, decaying all of them in one pass
+        recency = self.recency_scores(exchanges)
+        ranking = [(memory.importance + score) / 2 for memory, score in zip(exchanges, recency)]
+        by_rank = sorted(range(len(exchanges)), key=ranking.__getitem__, reverse=True)
         
-        # Keep top 80 most important memories
-        important_memories = self.memories[:80]
+        # Keep the most important memories
+        important_memories = [exchanges[i] for i in by_rank[:self.KEEP_IMPORTANT]]
         
-        # Keep 20 most recent memories
-        recent_memories = sorted(self.memories, key=lambda x: x['timestamp'], reverse=True)[:20]
+        # Keep the most recent memories
+        recent_memories = sorted(exchanges, key=self.memory_epoch, reverse=True)[:self.KEEP_RECENT]
         
         # Combine and remove duplicates
-        self.memories = list({m['timestamp']: m for m in important_memories + recent_memories}.values())
-        
-        # Rebuild categories
-        self.categories = {
-            'personal': [],
-            'emotions': [],
-            'activities': [],
-            'time': [],
-            'location': []
-        }
-        for memory in self.memories:
-            self.categorize_memory(memory) 
\ No newline at end of file
+        kept = {m.id for m in important_memories + recent_memories}
+        removed = [m for m in exchanges if m.id not in kept]
+        self.drop_memories(removed)
+        return removed
+    
+    def drop_memories(self, removed):
+        """Remove memories from the list, their categories and every index"""
+        removed_ids = {m.id for m in removed}
+        self.memories = [m for m in self.memories if m.id not in removed_ids]
+        self.generation += 1
+        self.index.sync(self.memories)
+        self.time_index.sync(self.memories)
+        if self.duplicates is not None:
+            self.duplicates.sync(self.memories)
+        if self.scorer is not None:
+            self.scorer.sync(self.memories)
+        if self.embeddings is not None:
+            self.embeddings.sync(self.memories)
+        
+        # Drop removed ids from categories
+        for memory in removed:
+            self.resident_bytes -= estimate_memory_bytes(memory)
+            for topic in memory.topics:
+                self.categories.get(topic, set()).discard(memory.id)
+    
+    def compact_memories(self, removed, now=None):
+        """Fold pruned exchanges into day summaries and roll old summaries up a level.
+        
+        Day summaries older than two weeks become week summaries and week
+        summaries older than two months become month summaries, so the
+        store stays small while old conversations stay retrievable.
+        Returns the new summaries and the older summaries they replace.
+        """
+        added, replaced = self.rollup_summaries([m for m in self.memories if m.level is not None], removed, now)
+        if replaced:
+            self.drop_memories(replaced)
+        for memory in added:
+            self.track_memory(memory)
+        self.generation += 1
+        return added, replaced
+    
+    def rollup_summaries(self, existing, removed, now=None):
+        """New summaries for the removed exchanges and expired summaries, and the existing ones they replace"""
+        now = time.time() if now is None else now
+        existing = {(m.level, m.epoch): m for m in existing}
+        summaries = dict(existing)
+        self.fold_summaries(summaries, removed, 'day')
+        for level, parent, days in ROLLUPS:
+            expired = [m for m in summaries.values() if m.level == level and m.epoch < now - days * 86400]
+            for memory in expired:
+                del summaries[(memory.level, memory.epoch)]
+            self.fold_summaries(summaries, expired, parent)
+        
+        added = [m for key, m in summaries.items() if existing.get(key) is not m]
+        replaced = [m for key, m in existing.items() if summaries.get(key) is not m]
+        return added, replaced
+    
+    def fold_summaries(self, summaries, memories, level):
+        """Merge memories into the ``level`` summaries of their periods, keyed by (level, epoch)"""
+        periods = defaultdict(list)
+        for memory in memories:
+            periods[period_start(memory.epoch, level)].append(memory)
+        for start, group in periods.items():
+            key = (level, start.timestamp())
+            if key in summaries:
+                group.insert(0, summaries[key])
+            summaries[key] = self.summarize_period(level, start, group)
+    
+    def summarize_period(self, level, start, memories):
+        """Build the summary record of one period from its memories"""
+        lines = summarize(list(summary_lines(memories)), SUMMARY_LENGTHS[level])
+        title = summary_title(level, start)
+        text = "\n".join(f"{speaker}: {sentence}" for speaker, sentence in lines)
+        topics, emotions, keywords = self.classify(text)
+        memory = MemoryRecord.create(
+            self.next_id, title, text, start.isoformat(), keywords, topics, emotions,
+            max(m.importance for m in memories), sum(m.hits for m in memories), level
+        )
+        self.next_id += 1
+        return memory
@@ -0,0 +1,148 @@
+"""Process-wide pool of per-user, per-character memory managers."""
+
+import threading
+from .memory_manager import MemoryManager
+from .state_cache import MemoryStateCache
+
+
+class MemorySession:
+    """Handle on one (user_id, character) memory, valid for the life of the pool.
+
+    The underlying MemoryManager may be flushed and unloaded while the
+    session is idle; the next call transparently loads it again.
+    """
+
+    def __init__(self, pool, user_id, character):
+        self.pool = pool
+        self.user_id = user_id
+        self.character = character
+        self.key = (user_id, character)
+
+    def call(self, name, *args, **kwargs):
+        """Run a MemoryManager method with the session's manager loaded"""
+        with self.pool.borrow(self.key) as manager:
+            return getattr(manager, name)(*args, **kwargs)
+
+    def add_memory(self, user_input, ai_response):
+        return self.call('add_memory', user_input, ai_response)
+
+    def find_relevant_memories(self, query, limit=5):
+        return self.call('find_relevant_memories', query, limit)
+
+    def get_category(self, category):
+        return self.call('get_category', category)
+
+    def cache_stats(self):
+        return self.call('cache_stats')
+
+    @property
+    def memories(self):
+        with self.pool.borrow(self.key) as manager:
+            return list(manager.memories)
+
+
+class Borrowed:
+    """Context manager returned by MemoryPool.borrow"""
+
+    def __init__(self, pool, key):
+        self.pool = pool
+        self.key = key
+        self.entry = None
+
+    def __enter__(self):
+        self.entry = self.pool.acquire(self.key)
+        self.entry['lock'].acquire()
+        return self.entry['manager']
+
+    def __exit__(self, *exc):
+        self.entry['lock'].release()
+        self.pool.release(self.key)
+
+
+class MemoryPool:
+    """Hand out memory sessions for many users while bounding resident memory.
+
+    Idle managers are kept in a MemoryStateCache bounded by count and by the
+    estimated bytes of their loaded memories; the least recently used ones
+    are flushed to disk in the background and dropped. Managers in use are
+    never evicted, and each is used by one thread at a time.
+    """
+
+    def __init__(self, max_sessions=64, max_bytes=256 * 1024 * 1024, memory_dir=None, writer=None, **manager_options):
+        self.memory_dir = memory_dir
+        self.writer = writer
+        self.manager_options = manager_options
+        self.lock = threading.Lock()
+        self.active = {}
+        self.idle = MemoryStateCache(max_sessions, max_bytes, on_evict=self.unload)
+
+    def session(self, user_id, character):
+        """Return a handle on a user's memories of one character"""
+        return MemorySession(self, user_id, character)
+
+    def borrow(self, key):
+        return Borrowed(self, key)
+
+    def acquire(self, key):
+        """Load or reuse the manager for a key and pin it while in use"""
+        with self.lock:
+            entry = self.active.get(key)
+            if entry is None:
+                manager = self.idle.pop(key)
+                if manager is None:
+                    # Never read files that an evicted manager is still flushing
+                    self.idle.wait(key)
+                    manager = self.create_manager(*key)
+                entry = {'manager': manager, 'lock': threading.Lock(), 'users': 0}
+                self.active[key] = entry
+            entry['users'] += 1
+            return entry
+
+    def release(self, key):
+        """Unpin a manager, parking it in the idle cache once nobody uses it"""
+        with self.lock:
+            entry = self.active[key]
+            entry['users'] -= 1
+            if entry['users'] == 0:
+                del self.active[key]
+                manager = entry['manager']
+                self.idle.put(key, manager, manager.resident_bytes)
+
+    def create_manager(self, user_id, character):
+        # A session manager serves a single character, so it needs no character cache of its own
+        return MemoryManager(
+            character, user_id=user_id, memory_dir=self.memory_dir, writer=self.writer,
+            cache_characters=0, **self.manager_options
+        )
+
+    @staticmethod
+    def unload(key, manager):
+        """Flush an evicted manager to disk, runs on a background thread"""
+        manager.flush_state(manager.character, manager.capture_state())
+        manager.state_cache.close()
+
+    def resident_bytes(self):
+        """Estimated bytes of every loaded memory in the pool"""
+        with self.lock:
+            active = sum(entry['manager'].resident_bytes for entry in self.active.values())
+            return active + self.idle.total_bytes
+
+    def close(self):
+        """Flush every idle manager and any pending background writes"""
+        with self.lock:
+            self.idle.close()
+        if self.writer is not None:
+            self.writer.flush()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool(**options):
+    """The process-wide MemoryPool, created on first use"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = MemoryPool(**options)
+        return _default_pool
@@ -0,0 +1,202 @@
+"""Compact in-memory representation of a single memory."""
+
+import threading
+import tracemalloc
+from array import array
+from datetime import datetime
+from .text_classifier import TOPIC_ORDER, EMOTION_ORDER
+
+
+class Vocabulary:
+    """Shared keyword <-> integer id table"""
+
+    def __init__(self):
+        self.ids = {}
+        self.words = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    def intern(self, word):
+        """Return the id of a word, adding it if it is new"""
+        word_id = self.ids.get(word)
+        if word_id is None:
+            with self.lock:
+                word_id = self.ids.get(word)
+                if word_id is None:
+                    word_id = len(self.words)
+                    self.words.append(word)
+                    self.ids[word] = word_id
+        return word_id
+
+    def lookup(self, word_id):
+        return self.words[word_id]
+
+
+# Keywords repeat heavily across memories and characters, so they are stored once
+KEYWORDS = Vocabulary()
+
+
+def to_mask(labels, order):
+    """Encode labels as a bitmask over the given label order"""
+    return sum(1 << bit for bit, label in enumerate(order) if label in labels)
+
+
+def from_mask(mask, order):
+    """Decode a bitmask back into labels"""
+    return [label for bit, label in enumerate(order) if mask & (1 << bit)]
+
+
+class MemoryRecord:
+    """One remembered exchange, stored without a per-memory dict.
+
+    Topics and emotions are bitmasks, the timestamp is epoch seconds and
+    keywords are ids into the shared vocabulary. Item access with the old
+    dict keys (``memory['user']``, ``memory['topics']``...) keeps working,
+    and ``to_dict`` produces the JSON schema used on disk.
+    """
+
+    __slots__ = ('id', 'user', 'ai', 'epoch', 'topic_mask', 'emotion_mask', 'keyword_ids', 'importance', 'hits',
+                 'level')
+
+    def __init__(self, id, user, ai, epoch, topic_mask=0, emotion_mask=0, keyword_ids=None, importance=0.5, hits=1,
+                 level=None):
+        self.id = id
+        self.user = user
+        self.ai = ai
+        self.epoch = epoch
+        self.topic_mask = topic_mask
+        self.emotion_mask = emotion_mask
+        self.keyword_ids = keyword_ids if keyword_ids is not None else array('I')
+        self.importance = importance
+        # How many near-identical exchanges were merged into this memory
+        self.hits = hits
+        # None for an exchange, or 'day'/'week'/'month' for a summary of older memories
+        self.level = level
+
+    @classmethod
+    def create(cls, id, user, ai, timestamp, keywords, topics, emotions, importance, hits=1, level=None):
+        """Build a record from the values produced by the classifier"""
+        return cls(
+            id, user, ai,
+            datetime.fromisoformat(timestamp).timestamp(),
+            to_mask(topics, TOPIC_ORDER),
+            to_mask(emotions, EMOTION_ORDER),
+            array('I', (KEYWORDS.intern(keyword) for keyword in keywords)),
+            importance,
+            hits,
+            level
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from the on-disk JSON schema"""
+        return cls.create(
+            data['id'], data['user'], data['ai'], data['timestamp'],
+            data.get('keywords', []), data.get('topics', []), data.get('emotions', []),
+            data.get('importance', 0.5), data.get('hits', 1), data.get('level')
+        )
+
+    @property
+    def timestamp(self):
+        return datetime.fromtimestamp(self.epoch).isoformat()
+
+    @property
+    def topics(self):
+        return from_mask(self.topic_mask, TOPIC_ORDER)
+
+    @property
+    def emotions(self):
+        return from_mask(self.emotion_mask, EMOTION_ORDER)
+
+    @property
+    def keywords(self):
+        return [KEYWORDS.lookup(word_id) for word_id in self.keyword_ids]
+
+    def to_dict(self):
+        """Serialize to the existing memory JSON schema"""
+        data = {
+            'id': self.id,
+            'user': self.user,
+            'ai': self.ai,
+            'timestamp': self.timestamp,
+            'keywords': self.keywords,
+            'topics': self.topics,
+            'emotions': self.emotions,
+            'importance': self.importance,
+            'hits': self.hits
+        }
+        if self.level is not None:
+            data['level'] = self.level
+        return data
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def __repr__(self):
+        return f"MemoryRecord(id={self.id!r}, user={self.user[:30]!r}, timestamp={self.timestamp!r})"
+
+
+MemoryRecord.KEYS = frozenset(('id', 'user', 'ai', 'timestamp', 'keywords', 'topics', 'emotions', 'importance', 'hits',
+                              'level'))
+
+
+def json_default(obj):
+    """``json.dump`` hook serializing records in the on-disk schema"""
+    if isinstance(obj, MemoryRecord):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def measure(count=10000):
+    """Compare traced memory of plain dicts and MemoryRecords for ``count`` memories"""
+    from .text_classifier import classify
+
+    samples = [
+        ("How was your day at school?", "It was great! We played games in the park after class."),
+        ("I'm feeling a bit down today", "Oh no, I'm sorry. Do you want to talk about it?"),
+        ("What music do you like?", "I love anime soundtracks and anything I can dance to!"),
+    ]
+    now = datetime.now()
+
+    def build(as_record):
+        memories = []
+        for i in range(count):
+            user, ai = samples[i % len(samples)]
+            # Copy the strings so every memory owns its text, like loaded JSON does
+            user, ai = f"{user} #{i}", f"{ai} #{i}"
+            topics, emotions, keywords = classify(user + " " + ai)
+            timestamp = now.replace(microsecond=i % 1000000).isoformat()
+            if as_record:
+                memories.append(MemoryRecord.create(i, user, ai, timestamp, keywords, topics, emotions, 0.7))
+            else:
+                memories.append({
+                    'id': i, 'user': user, 'ai': ai, 'timestamp': timestamp, 'keywords': keywords,
+                    'topics': topics, 'emotions': emotions, 'importance': 0.7, 'recency_score': 1.0
+                })
+        return memories
+
+    results = {}
+    for name, as_record in (('dict', False), ('record', True)):
+        tracemalloc.start()
+        memories = build(as_record)
+        results[name], _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del memories
+    return results
+
+
+if __name__ == "__main__":
+    sizes = measure()
+    print(f"dict memories:   {sizes['dict'] / 1024 / 1024:.2f} MiB per 10k")
+    print(f"MemoryRecord:    {sizes['record'] / 1024 / 1024:.2f} MiB per 10k")
+    print(f"reduction:       {sizes['dict'] / sizes['record']:.1f}x")
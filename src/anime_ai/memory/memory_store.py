@@ -0,0 +1,166 @@
+"""Snapshot + append-only log persistence for character memories."""
+
+import os
+import json
+import threading
+from .memory_record import json_default
+
+
+def memory_key(memory):
+    """Identity of a stored memory: its id, or its timestamp in files written before ids existed"""
+    return memory.get('id', memory['timestamp'])
+
+
+def replay(memories, records):
+    """Apply log records on top of the snapshot memories"""
+    known = {memory_key(memory) for memory in memories}
+    by_id = None
+    for record in records:
+        if record.get('op') == 'add':
+            memory = record['memory']
+            # Records may already be in the snapshot if compaction was interrupted
+            if memory_key(memory) not in known:
+                known.add(memory_key(memory))
+                memories.append(memory)
+                if by_id is not None:
+                    by_id[memory.get('id')] = memory
+        elif record.get('op') == 'remove':
+            # Keys are memory ids, or timestamps in logs written before ids existed
+            removed = set(record.get('keys', []))
+            memories = [m for m in memories if m.get('id') not in removed and m['timestamp'] not in removed]
+            known = {memory_key(memory) for memory in memories}
+            by_id = None
+        elif record.get('op') == 'update':
+            # Fields changed in place, e.g. a near-duplicate merged into the memory
+            if by_id is None:
+                by_id = {memory.get('id'): memory for memory in memories}
+            memory = by_id.get(record.get('id'))
+            if memory is not None:
+                memory.update(record.get('fields', {}))
+    return memories
+
+
+class MemoryStore:
+    """Persist memories as a JSON snapshot plus an append-only JSONL log.
+
+    The snapshot is the regular ``<character>_memory.json`` file, so files
+    written before the log existed load unchanged. Every change after the
+    snapshot is appended to ``<character>_memory.log.jsonl`` as one record;
+    compaction folds the log back into the snapshot with an atomic rename.
+
+    Writes can be queued with ``queue``/``queue_snapshot`` and performed
+    later by ``flush``, e.g. from a background writer thread.
+    """
+
+    def __init__(self, snapshot_file, compact_every=200, compact_bytes=1024 * 1024, fsync=True):
+        self.snapshot_file = snapshot_file
+        self.log_file = snapshot_file[:-len('.json')] + '.log.jsonl' if snapshot_file.endswith('.json') else snapshot_file + '.log.jsonl'
+        self.compact_every = compact_every
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+        self.log_records = 0
+        self.log_bytes = 0
+        self.queued_records = []
+        self.queued_snapshot = None
+        self.queue_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    def load(self):
+        """Read the snapshot and the log records written after it"""
+        data = {}
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        return data, self.load_log()
+
+    def load_log(self):
+        """Read the log records, cutting a torn final line"""
+        records = []
+        self.log_records = 0
+        self.log_bytes = 0
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'rb') as f:
+                raw = f.read()
+            end = raw.rfind(b'\n') + 1
+            if end < len(raw):
+                # Cut a torn final line from a crash mid-append so new records start cleanly
+                print(f"Warning: Dropping incomplete record at the end of {self.log_file}")
+                with open(self.log_file, 'r+b') as f:
+                    f.truncate(end)
+                raw = raw[:end]
+            self.log_bytes = len(raw)
+            for line in raw.decode('utf-8').splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping corrupt record in {self.log_file}")
+                    continue
+                self.log_records += 1
+        return records
+
+    def append(self, *records):
+        """Append records to the log, one JSON document per line"""
+        lines = "".join(json.dumps(record, ensure_ascii=False, default=json_default) + "\n" for record in records)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.log_records += len(records)
+        self.log_bytes += len(lines.encode('utf-8'))
+
+    def needs_compaction(self):
+        """Whether the log has grown enough to be folded into the snapshot"""
+        log_records = self.log_records + len(self.queued_records)
+        return log_records >= self.compact_every or self.log_bytes >= self.compact_bytes
+
+    def has_pending(self):
+        """Whether there are queued writes or log records not yet in the snapshot"""
+        return bool(self.queued_records or self.queued_snapshot is not None or self.log_records)
+
+    def queue(self, *records):
+        """Queue log records for the next flush"""
+        with self.queue_lock:
+            self.queued_records.extend(records)
+
+    def queue_snapshot(self, data):
+        """Queue a snapshot for the next flush.
+
+        The snapshot already contains every queued record, so those are
+        dropped; records queued afterwards are appended after it is written.
+        """
+        with self.queue_lock:
+            self.queued_records = []
+            self.queued_snapshot = data
+            self.log_records = 0
+            self.log_bytes = 0
+
+    def flush(self):
+        """Write the queued snapshot and then the queued log records"""
+        with self.flush_lock:
+            with self.queue_lock:
+                records, self.queued_records = self.queued_records, []
+                snapshot, self.queued_snapshot = self.queued_snapshot, None
+            if snapshot is not None:
+                self.write_snapshot(snapshot)
+            if records:
+                self.append(*records)
+
+    def write_snapshot(self, data):
+        """Atomically replace the snapshot, then drop the now redundant log"""
+        tmp_file = self.snapshot_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+
+        # Replaying records already in the snapshot is harmless, so a crash
+        # between the rename and this truncation loses nothing
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self.log_records = 0
+        self.log_bytes = 0
@@ -0,0 +1,440 @@
+"""Streaming migration and re-indexing of memory files."""
+
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import chain, islice
+from .memory_store import MemoryStore, memory_key, replay
+from .dedup import deduplicate
+from .memory_manager import CATEGORY_NAMES, DEFAULT_MEMORY_DIR
+from .text_classifier import classify_batch
+
+MEMORY_FIELDS = ('id', 'user', 'ai', 'timestamp', 'keywords', 'topics', 'emotions', 'importance', 'hits')
+
+# What the snapshot scanner stops at: structure outside strings, quotes and escapes inside them
+STRUCTURE = re.compile(r'["\[\]{}]')
+STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+SCALAR_END = re.compile(r'[\s,\]}:]')
+
+
+class SnapshotReader:
+    """Parse a memory snapshot incrementally, yielding one memory at a time.
+
+    Only the current chunk of the file is buffered. A regex scanner finds
+    where each value ends, reading further chunks as needed, and each memory
+    is then decoded once with ``json.JSONDecoder.raw_decode``. Of the other
+    top-level fields only the ones named in ``keep`` are decoded into
+    ``fields``; the rest, like the legacy ``categories`` that repeat every
+    memory, are skipped without ever being held whole.
+    """
+
+    def __init__(self, f, chunk_size=1024 * 1024, keep=('character',)):
+        self.file = f
+        self.chunk_size = chunk_size
+        self.keep = keep
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.fields = {}
+
+    def fill(self, start=None):
+        """Read the next chunk, keeping the buffer from ``start`` (default: the unparsed rest) on"""
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        start = self.pos if start is None else start
+        self.buffer = self.buffer[start:] + chunk
+        self.pos -= start
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of memory file")
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r} in memory file")
+        self.pos += 1
+
+    def scan(self, keep):
+        """Move ``pos`` to the end of the next JSON value, reading more of the file as needed.
+
+        With ``keep`` the value's text stays in the buffer from the returned
+        offset on; otherwise it is dropped as it is passed. Every character
+        is scanned once, however many chunks the value spans.
+        """
+        self.peek()
+        if self.buffer[self.pos] not in '"[{':
+            # A number, true, false or null, which may continue in the next chunk
+            while True:
+                match = SCALAR_END.search(self.buffer, self.pos + 1)
+                if match is not None:
+                    start, self.pos = self.pos, match.start()
+                    return start
+                if not self.fill(self.pos):
+                    start, self.pos = self.pos, len(self.buffer)
+                    return start
+        start = self.pos
+        i = self.pos
+        depth = 0
+        in_string = False
+        while True:
+            if in_string:
+                # Up to the closing quote, or to the end of the buffer (before a dangling backslash)
+                i = STRING_BODY.match(self.buffer, i).end()
+                if i < len(self.buffer) and self.buffer[i] == '"':
+                    i += 1
+                    in_string = False
+                    if depth == 0:
+                        self.pos = i
+                        return start
+                    continue
+            else:
+                match = STRUCTURE.search(self.buffer, i)
+                if match is not None:
+                    char = match.group()
+                    i = match.end()
+                    if char == '"':
+                        in_string = True
+                        continue
+                    depth += 1 if char in '[{' else -1
+                    if depth == 0:
+                        self.pos = i
+                        return start
+                    continue
+                i = len(self.buffer)
+            cut = start if keep else i
+            self.pos = i
+            if not self.fill(cut):
+                raise ValueError("Unexpected end of memory file")
+            i = self.pos
+            start -= cut
+
+    def value(self):
+        """Decode the next JSON value"""
+        self.peek()
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            # A number at the very end of the buffer may continue in the next chunk
+            if end < len(self.buffer) or self.eof:
+                self.pos = end
+                return value
+        except json.JSONDecodeError:
+            pass
+        # Cut off by the end of the buffer: find where it ends, then decode it once
+        start = self.scan(keep=True)
+        value, end = self.decoder.raw_decode(self.buffer, start)
+        if end != self.pos:
+            raise ValueError("Malformed value in memory file")
+        return value
+
+    def skip(self):
+        """Pass over the next JSON value without decoding or buffering it"""
+        self.scan(keep=False)
+
+    def memories(self):
+        """Yield every memory of the snapshot in file order"""
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key == 'memories':
+                self.expect('[')
+                if self.peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self.value()
+                        separator = self.peek()
+                        self.pos += 1
+                        if separator == ']':
+                            break
+                        if separator != ',':
+                            raise ValueError(f"Unexpected {separator!r} in memory list")
+            elif key in self.keep:
+                self.fields[key] = self.value()
+            else:
+                self.skip()
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Unexpected {separator!r} in memory file")
+
+
+class IdAllocator:
+    """Keep existing memory ids and give fresh ones to memories without (or with clashing) ids"""
+
+    def __init__(self):
+        self.used = set()
+        self.next_id = 1
+        self.reassigned = 0
+
+    def assign(self, memory):
+        memory_id = memory.get('id')
+        if not isinstance(memory_id, int) or memory_id in self.used:
+            while self.next_id in self.used:
+                self.next_id += 1
+            if memory_id is not None:
+                self.reassigned += 1
+            memory_id = self.next_id
+        self.used.add(memory_id)
+        memory['id'] = memory_id
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def memory_files(paths):
+    """Expand files and directories into the ``*_memory.json`` files under them.
+
+    A store that so far only has a log still counts, by its snapshot path.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                names = {name[:-len('.log.jsonl')] + '.json' if name.endswith('_memory.log.jsonl') else name
+                         for name in files}
+                for name in sorted(names):
+                    if name.endswith('_memory.json'):
+                        yield os.path.join(root, name)
+        elif os.path.exists(path):
+            yield path
+        else:
+            print(f"Warning: {path} does not exist")
+
+
+def normalize(memory):
+    """Bring a memory from any older format to the current field set, without classifying it"""
+    memory.pop('recency_score', None)
+    memory.setdefault('importance', 0.5)
+    memory.setdefault('hits', 1)
+    return memory
+
+
+def stored_fields(memory):
+    """The fields written to the snapshot; only summaries carry a level"""
+    record = {field: memory[field] for field in MEMORY_FIELDS}
+    if memory.get('level') is not None:
+        record['level'] = memory['level']
+    return record
+
+
+def needs_classification(memory):
+    return not all(field in memory for field in ('keywords', 'topics', 'emotions'))
+
+
+def classify_memories(memories, executor, reclassify, batch_size, workers):
+    """Yield memories with keywords, topics and emotions computed.
+
+    With ``reclassify`` every memory is recomputed in batches on the process
+    pool, with at most two batches per worker in flight so memory stays
+    bounded; otherwise only memories missing those fields are classified.
+    """
+    in_flight = deque()
+    for batch in batched(memories, batch_size):
+        todo = batch if reclassify else [memory for memory in batch if needs_classification(memory)]
+        texts = [memory['user'] + " " + memory['ai'] for memory in todo]
+        if executor is not None and texts:
+            in_flight.append((batch, todo, executor.submit(classify_batch, texts)))
+        else:
+            in_flight.append((batch, todo, classify_batch(texts)))
+        while in_flight and (len(in_flight) > 2 * workers or not hasattr(in_flight[0][2], 'result')):
+            yield from finish_batch(*in_flight.popleft())
+    while in_flight:
+        yield from finish_batch(*in_flight.popleft())
+
+
+def finish_batch(batch, todo, results):
+    if hasattr(results, 'result'):
+        results = results.result()
+    for memory, (topics, emotions, keywords) in zip(todo, results):
+        memory['topics'] = topics
+        memory['emotions'] = emotions
+        memory['keywords'] = keywords
+    yield from batch
+
+
+def migrate_file(path, executor=None, reclassify=False, batch_size=1000, workers=1):
+    """Rewrite one memory file (and its log) in the current format, atomically.
+
+    Returns throughput statistics for the file.
+    """
+    start = time.perf_counter()
+    store = MemoryStore(path)
+    input_bytes = sum(os.path.getsize(p) for p in (path, store.log_file) if os.path.exists(p))
+
+    # Log records are small: removals and updates are applied while streaming, additions appended at the end
+    added = []
+    removed = set()
+    updates = {}
+    for record in store.load_log():
+        if record.get('op') == 'add':
+            added.append(record['memory'])
+        elif record.get('op') == 'remove':
+            removed.update(record.get('keys', []))
+        elif record.get('op') == 'update':
+            updates.setdefault(record.get('id'), {}).update(record.get('fields', {}))
+
+    ids = IdAllocator()
+    known = set()
+    categories = {name: [] for name in CATEGORY_NAMES}
+    count = 0
+    tmp_file = path + '.tmp'
+    source = open(path, 'r', encoding='utf-8') if os.path.exists(path) else None
+    try:
+        reader = SnapshotReader(source) if source is not None else None
+
+        def pending():
+            for memory in chain(reader.memories() if reader else (), added):
+                # Same rules as replay(): drop removed memories and duplicated log records
+                if memory.get('id') in removed or memory['timestamp'] in removed or memory_key(memory) in known:
+                    continue
+                known.add(memory_key(memory))
+                if memory.get('id') in updates:
+                    memory.update(updates[memory['id']])
+                yield normalize(memory)
+
+        with open(tmp_file, 'w', encoding='utf-8') as out:
+            out.write('{\n  "memories": [')
+            for memory in classify_memories(pending(), executor, reclassify, batch_size, workers):
+                ids.assign(memory)
+                for topic in memory['topics']:
+                    if topic in categories:
+                        categories[topic].append(memory['id'])
+                record = stored_fields(memory)
+                out.write((",\n    " if count else "\n    ") + json.dumps(record, ensure_ascii=False))
+                count += 1
+            fields = reader.fields if reader else {}
+            character = fields.get('character') or os.path.basename(path)[:-len('_memory.json')]
+            out.write("\n  ],\n")
+            out.write(f'  "categories": {json.dumps({name: sorted(v) for name, v in categories.items()})},\n')
+            out.write(f'  "last_updated": {json.dumps(datetime.now().isoformat())},\n')
+            out.write(f'  "character": {json.dumps(character, ensure_ascii=False)}\n}}\n')
+            out.flush()
+            os.fsync(out.fileno())
+    except Exception:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    finally:
+        if source is not None:
+            source.close()
+
+    os.replace(tmp_file, path)
+    if os.path.exists(store.log_file):
+        os.remove(store.log_file)
+    if ids.reassigned:
+        # Cached embeddings are keyed by id, so let them be rebuilt from the new ids
+        base = os.path.splitext(path)[0]
+        for suffix in ('.vectors.f16', '.vectors.ids'):
+            if os.path.exists(base + suffix):
+                os.remove(base + suffix)
+
+    seconds = time.perf_counter() - start
+    return {
+        'file': path,
+        'memories': count,
+        'seconds': seconds,
+        'memories_per_second': count / seconds if seconds else 0.0,
+        'megabytes_per_second': input_bytes / 1024 / 1024 / seconds if seconds else 0.0
+    }
+
+
+def categories_of(memories):
+    """Category id lists as stored in the snapshot"""
+    categories = {name: [] for name in CATEGORY_NAMES}
+    for memory in memories:
+        for topic in memory['topics']:
+            if topic in categories:
+                categories[topic].append(memory['id'])
+    return categories
+
+
+def dedup_file(path, threshold=0.8):
+    """Merge near-duplicate memories of one file into their oldest copy.
+
+    Unlike migrate this loads the whole file, so run migrate first on files
+    in an old format.
+    """
+    start = time.perf_counter()
+    store = MemoryStore(path)
+    data, records = store.load()
+    memories = [normalize(memory) for memory in replay(data.get('memories', []), records)]
+    kept, merged = deduplicate(memories, threshold)
+    if merged or records:
+        store.write_snapshot({
+            'memories': [stored_fields(memory) for memory in kept],
+            'categories': categories_of(kept),
+            'last_updated': datetime.now().isoformat(),
+            'character': data.get('character') or os.path.basename(path)[:-len('_memory.json')]
+        })
+    return {'file': path, 'memories': len(memories), 'merged': merged, 'seconds': time.perf_counter() - start}
+
+
+def run_dedup(paths=None, threshold=0.8):
+    """Run the offline near-duplicate pass over every memory file under the given paths"""
+    totals = {'files': 0, 'memories': 0, 'merged': 0}
+    for path in memory_files(paths or [DEFAULT_MEMORY_DIR]):
+        try:
+            stats = dedup_file(path, threshold)
+        except Exception as e:
+            print(f"Warning: Could not deduplicate {path}: {e}")
+            continue
+        print(f"{stats['file']}: merged {stats['merged']} of {stats['memories']} memories in {stats['seconds']:.2f}s")
+        totals['files'] += 1
+        totals['memories'] += stats['memories']
+        totals['merged'] += stats['merged']
+    print(f"Done: {totals['files']} files, {totals['merged']} of {totals['memories']} memories merged")
+    return totals
+
+
+def run(paths=None, reclassify=False, workers=None, batch_size=1000):
+    """Migrate (or re-index, with ``reclassify``) every memory file under the given paths"""
+    files = list(memory_files(paths or [DEFAULT_MEMORY_DIR]))
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(workers) if reclassify and workers > 1 else None
+    totals = {'files': 0, 'memories': 0, 'seconds': 0.0}
+    try:
+        for path in files:
+            try:
+                stats = migrate_file(path, executor, reclassify, batch_size, workers)
+            except Exception as e:
+                print(f"Warning: Could not migrate {path}: {e}")
+                continue
+            print(
+                f"{stats['file']}: {stats['memories']} memories in {stats['seconds']:.2f}s "
+                f"({stats['memories_per_second']:.0f} memories/s, {stats['megabytes_per_second']:.1f} MB/s)"
+            )
+            totals['files'] += 1
+            totals['memories'] += stats['memories']
+            totals['seconds'] += stats['seconds']
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    rate = totals['memories'] / totals['seconds'] if totals['seconds'] else 0.0
+    print(f"Done: {totals['files']} files, {totals['memories']} memories in {totals['seconds']:.2f}s ({rate:.0f} memories/s)")
+    return totals
@@ -0,0 +1,65 @@
+"""Small LRU cache of memory retrieval results."""
+
+import time
+from collections import OrderedDict
+from .text_classifier import WORD_PATTERN
+
+
+def normalize_query(query):
+    """Lowercase a query and reduce it to its words, so "Hi!" and "hi" share an entry"""
+    return " ".join(WORD_PATTERN.findall(query.lower()))
+
+
+class QueryCache:
+    """LRU of search results keyed by the caller's key and a store generation.
+
+    The owner bumps its generation whenever the memories change, which makes
+    every older entry unreachable. ``ttl`` additionally bounds how long a
+    result is reused, since recency weighting drifts with the clock.
+    """
+
+    def __init__(self, max_entries=128, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Return the cached result for a key, or None on a miss"""
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, result, elapsed=0.0):
+        """Store a result as most recently used; ``elapsed`` is the time the miss cost"""
+        self.entries[key] = (result, time.monotonic())
+        self.entries.move_to_end(key)
+        self.miss_seconds += elapsed
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and the retrieval time the hits are estimated to have saved"""
+        lookups = self.hits + self.misses
+        average_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'average_miss_seconds': average_miss,
+            'saved_seconds': self.hits * average_miss
+        }
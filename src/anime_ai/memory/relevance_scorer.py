@@ -0,0 +1,390 @@
+"""Vectorized relevance scoring for memory retrieval."""
+
+import heapq
+import math
+import re
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from difflib import SequenceMatcher
+from .text_classifier import TOPIC_ORDER, EMOTION_ORDER
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+TOPICS = TOPIC_ORDER
+EMOTIONS = EMOTION_ORDER
+
+TOKEN_PATTERN = re.compile(r'\w+')
+# Rows rescored exactly before the remaining ones are pruned against the current top scores
+RESCORE_BATCH = 32
+
+
+def text_similarity(lowered_query, memory):
+    """SequenceMatcher ratio of the lowercased query against the closer side of an exchange"""
+    return max(
+        SequenceMatcher(None, lowered_query, memory.user.lower()).ratio(),
+        SequenceMatcher(None, lowered_query, memory.ai.lower()).ratio()
+    )
+
+
+class RelevanceScorer:
+    """Score every memory against a query in one batched NumPy pass.
+
+    Memory text is stored as a hashed bag-of-words sparse matrix (COO
+    triplets), alongside dense arrays for topic/emotion one-hot vectors,
+    importance, timestamps and text lengths. The topic, emotion and
+    importance terms of ``MemoryManager.score_memory`` are computed for
+    every row at once. The SequenceMatcher text term is then computed only
+    for rows whose length bound on it could still beat the current top
+    ``limit``, visited in order of their cosine similarity so that bar rises
+    quickly. Results are the same as the per-memory loop's.
+    """
+
+    def __init__(self, n_features=2 ** 18):
+        self.n_features = n_features
+        self.clear()
+
+    def clear(self):
+        """Remove every row"""
+        self.keys = []
+        self.rows = {}
+        self.memories = []
+        self.doc_freq = np.zeros(self.n_features, dtype=np.int32)
+
+        self.coo_rows = np.empty(0, dtype=np.int32)
+        self.coo_cols = np.empty(0, dtype=np.int32)
+        self.coo_vals = np.empty(0, dtype=np.float32)
+        # Float64 like the Python floats of score_memory, so both rank the same
+        self.topic_matrix = np.empty((0, len(TOPICS)), dtype=np.float64)
+        self.emotion_matrix = np.empty((0, len(EMOTIONS)), dtype=np.float64)
+        self.importance = np.empty(0, dtype=np.float64)
+        self.timestamps = np.empty(0, dtype=np.float64)
+        self.user_lengths = np.empty(0, dtype=np.float64)
+        self.ai_lengths = np.empty(0, dtype=np.float64)
+
+        # Rows added since the last query, concatenated lazily
+        self._pending = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def memory_key(memory):
+        """Return the key identifying a memory inside the scorer"""
+        return memory.id
+
+    def hash_features(self, text):
+        """Hash the tokens of a text into feature ids with their counts"""
+        counts = {}
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            feature = zlib.crc32(token.encode('utf-8')) % self.n_features
+            counts[feature] = counts.get(feature, 0) + 1
+        return counts
+
+    @staticmethod
+    def one_hot(values, vocabulary):
+        """Encode a list of labels as a one-hot vector"""
+        return [1.0 if label in values else 0.0 for label in vocabulary]
+
+    @staticmethod
+    def mask_one_hot(mask, size):
+        """Encode a MemoryRecord label bitmask as a one-hot vector"""
+        return [float((mask >> bit) & 1) for bit in range(size)]
+
+    def add(self, memory):
+        """Append a memory as a new row"""
+        key = self.memory_key(memory)
+        if key in self.rows:
+            return
+        counts = self.hash_features(memory.user + " " + memory.ai)
+        weights = {feature: 1.0 + math.log(count) for feature, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+
+        row = len(self.keys)
+        self.keys.append(key)
+        self.rows[key] = row
+        self.memories.append(memory)
+        for feature in counts:
+            self.doc_freq[feature] += 1
+
+        self._pending.append((
+            row,
+            list(weights.keys()),
+            [weight / norm for weight in weights.values()],
+            self.mask_one_hot(memory.topic_mask, len(TOPICS)),
+            self.mask_one_hot(memory.emotion_mask, len(EMOTIONS)),
+            memory.importance,
+            memory.epoch,
+            len(memory.user.lower()),
+            len(memory.ai.lower())
+        ))
+
+    def update(self, memory):
+        """Refresh the importance of a memory changed in place"""
+        self._flush_pending()
+        row = self.rows.get(self.memory_key(memory))
+        if row is not None:
+            self.importance[row] = memory.importance
+
+    def rebuild(self, memories):
+        """Replace the scorer contents with the given memories"""
+        self.clear()
+        for memory in memories:
+            self.add(memory)
+        self._flush_pending()
+
+    def _flush_pending(self):
+        """Concatenate rows added since the last query into the arrays"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self.coo_rows = np.concatenate([self.coo_rows] + [
+            np.full(len(cols), row, dtype=np.int32) for row, cols, *_ in pending
+        ])
+        self.coo_cols = np.concatenate([self.coo_cols] + [
+            np.asarray(cols, dtype=np.int32) for _, cols, *_ in pending
+        ])
+        self.coo_vals = np.concatenate([self.coo_vals] + [
+            np.asarray(vals, dtype=np.float32) for _, _, vals, *_ in pending
+        ])
+        self.topic_matrix = np.vstack([self.topic_matrix, np.asarray([p[3] for p in pending], dtype=np.float64)])
+        self.emotion_matrix = np.vstack([self.emotion_matrix, np.asarray([p[4] for p in pending], dtype=np.float64)])
+        self.importance = np.concatenate([self.importance, np.asarray([p[5] for p in pending], dtype=np.float64)])
+        self.timestamps = np.concatenate([self.timestamps, np.asarray([p[6] for p in pending], dtype=np.float64)])
+        self.user_lengths = np.concatenate([self.user_lengths, np.asarray([p[7] for p in pending], dtype=np.float64)])
+        self.ai_lengths = np.concatenate([self.ai_lengths, np.asarray([p[8] for p in pending], dtype=np.float64)])
+
+    def sync(self, memories):
+        """Drop every row whose memory is no longer in the given list"""
+        kept = {self.memory_key(memory) for memory in memories}
+        if len(kept) == len(self.keys) and all(key in kept for key in self.keys):
+            return
+        self._flush_pending()
+
+        keep = np.fromiter((key in kept for key in self.keys), dtype=bool, count=len(self.keys))
+        new_rows = np.cumsum(keep, dtype=np.int32) - 1
+        entry_mask = keep[self.coo_rows]
+
+        # Each (row, feature) pair appears once, so dropped entries are exact document counts
+        np.subtract.at(self.doc_freq, self.coo_cols[~entry_mask], 1)
+        self.coo_rows = new_rows[self.coo_rows[entry_mask]]
+        self.coo_cols = self.coo_cols[entry_mask]
+        self.coo_vals = self.coo_vals[entry_mask]
+        self.topic_matrix = self.topic_matrix[keep]
+        self.emotion_matrix = self.emotion_matrix[keep]
+        self.importance = self.importance[keep]
+        self.timestamps = self.timestamps[keep]
+        self.user_lengths = self.user_lengths[keep]
+        self.ai_lengths = self.ai_lengths[keep]
+
+        self.keys = [key for key, flag in zip(self.keys, keep) if flag]
+        self.memories = [memory for memory, flag in zip(self.memories, keep) if flag]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+    def rows_for(self, memories):
+        """Map memories to their row numbers"""
+        return [self.rows[self.memory_key(memory)] for memory in memories if self.memory_key(memory) in self.rows]
+
+    def text_scores(self, query):
+        """Cosine similarity between the query and every memory's text"""
+        n_rows = len(self.keys)
+        counts = self.hash_features(query)
+        if not counts or not n_rows:
+            return np.zeros(n_rows, dtype=np.float32)
+
+        features = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        idf = np.log((1.0 + n_rows) / (1.0 + self.doc_freq[features])) + 1.0
+        weights = (1.0 + np.log(tf)) * idf
+        weights /= np.linalg.norm(weights) or 1.0
+
+        order = np.argsort(features)
+        features, weights = features[order], weights[order]
+        positions = np.searchsorted(features, self.coo_cols)
+        positions[positions == len(features)] = 0
+        mask = features[positions] == self.coo_cols
+        return np.bincount(
+            self.coo_rows[mask],
+            weights=self.coo_vals[mask] * weights[positions[mask]],
+            minlength=n_rows
+        ).astype(np.float32)
+
+    @staticmethod
+    def overlap_scores(matrix, query_vector):
+        """Shared labels divided by the larger label count, as in calculate_topic_similarity"""
+        query_count = query_vector.sum()
+        if not query_count:
+            return np.zeros(len(matrix), dtype=np.float64)
+        row_counts = matrix.sum(axis=1)
+        common = matrix @ query_vector
+        return np.where(row_counts > 0, common / np.maximum(row_counts, query_count), 0.0)
+
+    def recency_scores(self, now=None):
+        """Exponential recency decay, as in MemoryManager.recency_score"""
+        now = datetime.now().timestamp() if now is None else now
+        hours_old = (now - self.timestamps) / 3600
+        return np.maximum(0.1, 0.95 ** hours_old)
+
+    @staticmethod
+    def ratio_bound(query_length, lengths):
+        """Upper bound on a SequenceMatcher ratio from the text lengths alone, as in real_quick_ratio"""
+        total = query_length + lengths
+        return np.where(total > 0, 2.0 * np.minimum(query_length, lengths) / np.maximum(total, 1.0), 1.0)
+
+    def score(self, query, query_topics, query_emotions, rows=None):
+        """Score terms for all (or the given) rows.
+
+        Returns the rows, the weighted topic, emotion and importance terms,
+        the cosine text similarity used to order the exact rescoring, and an
+        upper bound on the SequenceMatcher text term.
+        """
+        self._flush_pending()
+        topic_vector = np.asarray(self.one_hot(query_topics, TOPICS), dtype=np.float64)
+        emotion_vector = np.asarray(self.one_hot(query_emotions, EMOTIONS), dtype=np.float64)
+        terms = np.stack([
+            self.overlap_scores(self.topic_matrix, topic_vector) * 0.3,
+            self.overlap_scores(self.emotion_matrix, emotion_vector) * 0.2,
+            (self.importance + self.recency_scores()) / 2 * 0.1
+        ], axis=1)
+        cosine = self.text_scores(query)
+        query_length = len(query.lower())
+        bound = np.maximum(self.ratio_bound(query_length, self.user_lengths), self.ratio_bound(query_length, self.ai_lengths))
+        if rows is None:
+            rows = np.arange(len(self.keys))
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            terms, cosine, bound = terms[rows], cosine[rows], bound[rows]
+        return rows, terms, cosine, bound
+
+    def top_memories(self, query, query_topics, query_emotions, limit=5, rows=None, threshold=0.2):
+        """Return the best scoring memories above the threshold, best first"""
+        if not self.keys or limit <= 0:
+            return []
+        rows, terms, cosine, bound = self.score(query, query_topics, query_emotions, rows)
+        lowered = query.lower()
+        rest = terms.sum(axis=1)
+        best_possible = rest + bound * 0.4
+        # Most promising first, so the bar for the remaining rows rises quickly
+        order = np.argsort(-(rest + cosine * 0.4), kind='stable')
+        order = order[best_possible[order] > threshold]
+
+        # Min-heap of (score, -position): on equal scores the earlier candidate wins, as with a stable sort
+        top = []
+        while len(order):
+            batch, order = order[:RESCORE_BATCH], order[RESCORE_BATCH:]
+            for i in batch:
+                i = int(i)
+                if len(top) == limit and best_possible[i] < top[0][0]:
+                    continue
+                topic, emotion, importance = terms[i]
+                # Same expression and order as score_memory, so the floats agree exactly
+                score = (
+                    text_similarity(lowered, self.memories[rows[i]]) * 0.4 +
+                    float(topic) + float(emotion) + float(importance)
+                )
+                if score > threshold:
+                    heapq.heappush(top, (score, -i))
+                    if len(top) > limit:
+                        heapq.heappop(top)
+            if len(top) == limit and len(order):
+                order = order[best_possible[order] >= top[0][0]]
+        top.sort(key=lambda entry: (-entry[0], -entry[1]))
+        return [self.memories[rows[-position]] for _, position in top]
+
+
+def parity(exchanges=None, queries=None, limit=5, generated=300, seed=0):
+    """Compare vectorized retrieval with the per-memory SequenceMatcher loop it replaces.
+
+    Both rankings run over the same candidates of one MemoryManager, filled
+    with the sample exchanges plus ``generated`` random ones spread over the
+    last month; returns the mean number of shared top-``limit`` memories, how
+    many queries got the same ranking, and the time per query of each scorer.
+    """
+    import random
+    from .memory_manager import MemoryManager
+
+    exchanges = list(exchanges or [
+        ("How are you today?", "I'm great, thanks for asking!"),
+        ("I went to the park with my family this morning", "That sounds so lovely, was it sunny?"),
+        ("Work was terrible and I hate my boss", "Oh no, do you want to talk about it?"),
+        ("What do you like to do for fun?", "I love drawing cats and listening to music!"),
+        ("I'm playing a new game tonight", "Ooh, which one? Tell me everything!"),
+        ("My sister is visiting next week", "Yay! Are you going to show her around town?"),
+        ("I feel a bit lonely lately", "I'm always here for you, you know that?"),
+        ("We had pizza for dinner at the new place downtown", "Pizza! Was it any good?"),
+        ("I finally finished my drawing", "I'm so proud of you! Can I see it?"),
+        ("The rain kept me home all weekend", "Rainy weekends are perfect for games and tea."),
+        ("My cat knocked over my coffee", "Hehe, cats are such little troublemakers!"),
+        ("I'm nervous about my exam tomorrow", "You studied hard, you'll do great!"),
+    ])
+    queries = queries or [
+        "how was the park with your family?",
+        "do you remember what I said about my boss at work?",
+        "what games do you like to play?",
+        "I'm feeling lonely again",
+        "tell me about cats",
+        "what did we eat for dinner?",
+        "good luck on my exam",
+        "my sister loves drawing too",
+        "I'm so happy, work went great",
+        "music",
+    ]
+    rng = random.Random(seed)
+    words = [word for user, ai in exchanges for word in (user + " " + ai).split()]
+    for _ in range(generated):
+        exchanges.append((" ".join(rng.choices(words, k=rng.randint(3, 15))),
+                          " ".join(rng.choices(words, k=rng.randint(3, 15)))))
+
+    with tempfile.TemporaryDirectory() as memory_dir:
+        manager = MemoryManager("parity", memory_dir=memory_dir, dedup=False, compaction=False)
+        manager.MAX_MEMORIES = len(exchanges)
+        for user, ai in exchanges:
+            manager.add_memory(user, ai)
+        # Spread the memories over a month so recency matters
+        for memory in manager.memories:
+            memory.epoch -= rng.uniform(0, 30 * 86400)
+        manager.scorer.rebuild(manager.memories)
+
+        rankings = {}
+        timings = {}
+        for name, vectorized in (('legacy', False), ('vectorized', True)):
+            start = time.perf_counter()
+            rankings[name] = [
+                [memory.id for memory in manager.search_memories(query, limit=limit, vectorized=vectorized)]
+                for query in queries
+            ]
+            timings[name] = (time.perf_counter() - start) / len(queries) * 1e3
+        manager.close()
+
+    overlaps = [len(set(legacy) & set(vectorized)) for legacy, vectorized in zip(rankings['legacy'], rankings['vectorized'])]
+    return {
+        'mean_overlap': sum(overlaps) / len(overlaps),
+        'identical': sum(legacy == vectorized for legacy, vectorized in zip(rankings['legacy'], rankings['vectorized'])),
+        'queries': len(queries),
+        'limit': limit,
+        'legacy_ms': timings['legacy'],
+        'vectorized_ms': timings['vectorized']
+    }
+
+
+def check_parity(**kwargs):
+    """Run the parity harness and fail unless every vectorized ranking equals the legacy one"""
+    report = parity(**kwargs)
+    assert report['identical'] == report['queries'], (
+        f"vectorized retrieval differs from legacy on {report['queries'] - report['identical']} "
+        f"of {report['queries']} queries (top-{report['limit']} overlap {report['mean_overlap']:.2f})"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    report = check_parity()
+    print(f"top-{report['limit']} overlap: {report['mean_overlap']:.2f}/{report['limit']}")
+    print(f"identical:     {report['identical']}/{report['queries']} queries")
+    print(f"legacy:        {report['legacy_ms']:.3f} ms/query")
+    print(f"vectorized:    {report['vectorized_ms']:.3f} ms/query")
@@ -0,0 +1,331 @@
+"""SQLite/FTS5 storage backend for character memories."""
+
+import os
+import json
+import math
+import re
+import sqlite3
+from array import array
+from datetime import datetime
+from .memory_manager import MemoryManager, CATEGORY_NAMES
+from .memory_store import MemoryStore, replay
+from .query_cache import QueryCache
+from .relevance_scorer import TOPICS, EMOTIONS
+from .memory_record import MemoryRecord, KEYWORDS, to_mask
+from .time_index import parse_time_window, is_recall_question
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY,
+    character TEXT NOT NULL,
+    user TEXT NOT NULL,
+    ai TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    epoch REAL NOT NULL,
+    keywords TEXT NOT NULL,
+    topics INTEGER NOT NULL,
+    topic_count INTEGER NOT NULL,
+    emotions INTEGER NOT NULL,
+    emotion_count INTEGER NOT NULL,
+    importance REAL NOT NULL,
+    level TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_memories_character_epoch ON memories(character, epoch);
+CREATE INDEX IF NOT EXISTS idx_memories_character_importance ON memories(character, importance);
+CREATE INDEX IF NOT EXISTS idx_memories_character_topics ON memories(character, topics);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+    user, ai, content='memories', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories BEGIN
+    INSERT INTO memories_fts(rowid, user, ai) VALUES (new.id, new.user, new.ai);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories BEGIN
+    INSERT INTO memories_fts(memories_fts, rowid, user, ai) VALUES ('delete', old.id, old.user, old.ai);
+END;
+"""
+
+# Number of bits set in a 4-bit topic/emotion mask
+POPCOUNT_SQL = "((({0}) & 1) + ((({0}) >> 1) & 1) + ((({0}) >> 2) & 1) + ((({0}) >> 3) & 1))"
+
+# Same 0.4/0.3/0.2/0.1 weighting as MemoryManager.score_memory. The text term
+# maps the FTS5 bm25 rank (negative, lower is better) into [0, 1).
+SCORE_SQL = """
+    COALESCE(-matches.rank / (1.0 - matches.rank), 0.0) * 0.4
+    + CASE WHEN :topic_count = 0 OR m.topic_count = 0 THEN 0.0
+           ELSE {topic_common} * 1.0 / max(m.topic_count, :topic_count) END * 0.3
+    + CASE WHEN :emotion_count = 0 OR m.emotion_count = 0 THEN 0.0
+           ELSE {emotion_common} * 1.0 / max(m.emotion_count, :emotion_count) END * 0.2
+    + (m.importance + max(0.1, pow(0.95, (:now - m.epoch) / 3600.0))) / 2 * 0.1
+""".format(
+    topic_common=POPCOUNT_SQL.format("m.topics & :topics"),
+    emotion_common=POPCOUNT_SQL.format("m.emotions & :emotions")
+)
+
+MEMORY_COLUMNS = "m.id, m.user, m.ai, m.timestamp, m.epoch, m.keywords, m.topics, m.emotions, m.importance, m.level"
+
+
+class SqliteMemoryManager(MemoryManager):
+    """MemoryManager storing memories in SQLite with an FTS5 index over the text.
+
+    Filtering, ranking and pruning run inside SQLite, so only the rows that
+    are returned to the caller, or pruned and folded into summaries, are ever
+    materialized in Python.
+    """
+
+    def __init__(self, character="yuki", db_file=None, use_index=True, compaction=True):
+        self.character = character
+        self.use_index = use_index
+        self.compaction = compaction
+        # Rows get their ids from SQLite; summaries are numbered on insert
+        self.next_id = 0
+        self.memory_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "memories")
+        os.makedirs(self.memory_dir, exist_ok=True)
+        self.memory_file = os.path.join(self.memory_dir, f"{character}_memory.json")
+        self.db_file = db_file or os.path.join(self.memory_dir, "memories.db")
+
+        self.conn = sqlite3.connect(self.db_file)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self.conn.execute("SELECT pow(0.95, 1.0)")
+        except sqlite3.OperationalError:
+            # SQLite builds without the math extension lack pow()
+            self.conn.create_function("pow", 2, math.pow, deterministic=True)
+        self.conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(memories)")}
+        if 'level' not in columns:
+            # Databases created before summaries existed
+            self.conn.execute("ALTER TABLE memories ADD COLUMN level TEXT")
+        self.load_memory()
+
+    @property
+    def memories(self):
+        """All memories of the current character, oldest first"""
+        rows = self.conn.execute(
+            f"SELECT {MEMORY_COLUMNS} FROM memories m WHERE m.character = ? ORDER BY m.epoch",
+            (self.character,)
+        )
+        return [self.row_to_memory(row) for row in rows]
+
+    @property
+    def categories(self):
+        """Ids of the current character's memories grouped by topic, as kept by the JSON backend"""
+        return {name: {memory['id'] for memory in self.get_category(name)} for name in CATEGORY_NAMES}
+
+    def get_category(self, category):
+        """Return the memories filed under a category, selected by their topic bit"""
+        if category not in TOPICS:
+            return []
+        rows = self.conn.execute(
+            f"SELECT {MEMORY_COLUMNS} FROM memories m WHERE m.character = ? AND (m.topics & ?) != 0 ORDER BY m.id",
+            (self.character, to_mask([category], TOPICS))
+        )
+        return [self.row_to_memory(row) for row in rows]
+
+    def cache_stats(self):
+        """Results are ranked inside SQLite on every call and never cached, so there is nothing to count"""
+        return QueryCache(0).stats()
+
+    def row_to_memory(self, row):
+        """Convert a result row into the MemoryRecord used by the rest of the app"""
+        return MemoryRecord(
+            row['id'], row['user'], row['ai'], row['epoch'], row['topics'], row['emotions'],
+            array('I', (KEYWORDS.intern(keyword) for keyword in json.loads(row['keywords']))),
+            row['importance'], level=row['level']
+        )
+
+    def count_memories(self):
+        """Number of stored memories for the current character"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM memories WHERE character = ?", (self.character,)
+        ).fetchone()[0]
+
+    def set_character(self, character):
+        """Change the current character; rows are already on disk so nothing is reloaded"""
+        if self.character != character:
+            self.save_memory()
+            self.character = character
+            self.memory_file = os.path.join(self.memory_dir, f"{character}_memory.json")
+        self.load_memory()
+
+    def load_memory(self):
+        """Import the character's JSON memory file the first time they are used"""
+        if self.count_memories() or not os.path.exists(self.memory_file):
+            return
+        try:
+            data, records = MemoryStore(self.memory_file).load()
+            memories = replay(data.get('memories', []), records)
+            with self.conn:
+                for memory in memories:
+                    self.insert_memory(memory)
+        except Exception as e:
+            print(f"Warning: Could not import memory file for {self.character}: {e}")
+
+    def save_memory(self):
+        """Commit any pending changes"""
+        try:
+            self.conn.commit()
+        except Exception as e:
+            print(f"Warning: Could not save memory for {self.character}: {e}")
+
+    def insert_memory(self, memory):
+        """Insert a memory dict as a row for the current character"""
+        cursor = self.conn.execute(
+            """INSERT INTO memories (character, user, ai, timestamp, epoch, keywords,
+                                     topics, topic_count, emotions, emotion_count, importance, level)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                self.character,
+                memory['user'],
+                memory['ai'],
+                memory['timestamp'],
+                datetime.fromisoformat(memory['timestamp']).timestamp(),
+                json.dumps(memory.get('keywords', []), ensure_ascii=False),
+                to_mask(memory['topics'], TOPICS),
+                len(memory['topics']),
+                to_mask(memory['emotions'], EMOTIONS),
+                len(memory['emotions']),
+                memory['importance'],
+                memory.get('level')
+            )
+        )
+        return cursor.lastrowid
+
+    def add_memory(self, user_input, ai_response):
+        """Add a new memory with enhanced categorization"""
+        topics, emotions, keywords = self.classify(user_input + " " + ai_response)
+        importance = self.calculate_importance(user_input, ai_response, topics, emotions)
+
+        memory = {
+            'user': user_input,
+            'ai': ai_response,
+            'timestamp': datetime.now().isoformat(),
+            'keywords': keywords,
+            'topics': topics,
+            'emotions': emotions,
+            'importance': importance
+        }
+        try:
+            with self.conn:
+                memory['id'] = self.insert_memory(memory)
+                self.prune_memories()
+        except Exception as e:
+            print(f"Warning: Could not save memory for {self.character}: {e}")
+
+    @staticmethod
+    def match_expression(query):
+        """Build an FTS5 OR-query from the words of the user's message"""
+        words = dict.fromkeys(re.findall(r'\w+', query.lower()))
+        return " OR ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+    def find_relevant_memories(self, query, limit=5, full_scan=False, vectorized=None):
+        """Find memories relevant to the current query, ranked inside SQLite"""
+        query_topics, query_emotions, _ = self.classify(query)
+        params = {
+            'character': self.character,
+            'match': self.match_expression(query),
+            'topics': to_mask(query_topics, TOPICS),
+            'topic_count': len(query_topics),
+            'emotions': to_mask(query_emotions, EMOTIONS),
+            'emotion_count': len(query_emotions),
+            'now': datetime.now().timestamp(),
+            'limit': limit
+        }
+
+        if params['match']:
+            matches = "SELECT rowid, bm25(memories_fts) AS rank FROM memories_fts WHERE memories_fts MATCH :match"
+        else:
+            matches = "SELECT NULL AS rowid, NULL AS rank WHERE 0"
+
+        window = parse_time_window(query)
+        if window is not None:
+            # As in memories_in_window: only recall questions keep every memory in the window
+            params['start'], params['end'] = window
+            threshold = -1.0 if is_recall_question(query) else 0.2
+            found = self.rank_memories(matches, "AND m.epoch >= :start AND m.epoch < :end", threshold, params)
+            if found:
+                return found
+
+        # Mirror the inverted index: only rows sharing a word, topic or emotion with the query
+        candidate_filter = ""
+        if self.use_index and not full_scan:
+            candidate_filter = (
+                "AND (matches.rowid IS NOT NULL OR (m.topics & :topics) != 0 OR (m.emotions & :emotions) != 0)"
+            )
+        return self.rank_memories(matches, candidate_filter, 0.2, params)
+
+    def rank_memories(self, matches, candidate_filter, threshold, params):
+        """Run the scoring query over the rows passing the filter, best first"""
+        sql = f"""
+            WITH matches AS ({matches})
+            SELECT * FROM (
+                SELECT {MEMORY_COLUMNS}, {SCORE_SQL} AS score
+                FROM memories m LEFT JOIN matches ON matches.rowid = m.id
+                WHERE m.character = :character {candidate_filter}
+            )
+            WHERE score > {threshold}
+            ORDER BY score DESC
+            LIMIT :limit
+        """
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not search memories for {self.character}: {e}")
+            return []
+        return [self.row_to_memory(row) for row in rows]
+
+    def prune_memories(self):
+        """Keep the KEEP_IMPORTANT most important and KEEP_RECENT most recent exchanges.
+
+        The rest are selected and deleted inside SQLite; only they are loaded,
+        to be folded into summaries. Summaries are not counted against
+        MAX_MEMORIES, as in the JSON backend.
+        """
+        exchanges = self.conn.execute(
+            "SELECT COUNT(*) FROM memories WHERE character = ? AND level IS NULL", (self.character,)
+        ).fetchone()[0]
+        if exchanges <= self.MAX_MEMORIES:
+            return []
+        now = datetime.now().timestamp()
+        rows = self.conn.execute(
+            f"""SELECT {MEMORY_COLUMNS} FROM memories m
+               WHERE m.character = :character AND m.level IS NULL AND m.id NOT IN (
+                   SELECT id FROM memories WHERE character = :character AND level IS NULL
+                   ORDER BY (importance + max(0.1, pow(0.95, (:now - epoch) / 3600.0))) / 2 DESC
+                   LIMIT :keep_important
+               ) AND m.id NOT IN (
+                   SELECT id FROM memories WHERE character = :character AND level IS NULL
+                   ORDER BY epoch DESC
+                   LIMIT :keep_recent
+               )
+               ORDER BY m.epoch""",
+            {'character': self.character, 'now': now,
+             'keep_important': self.KEEP_IMPORTANT, 'keep_recent': self.KEEP_RECENT}
+        ).fetchall()
+        removed = [self.row_to_memory(row) for row in rows]
+        self.delete_memories(removed)
+        if removed and self.compaction:
+            self.compact_memories(removed)
+        return removed
+
+    def delete_memories(self, memories):
+        self.conn.executemany("DELETE FROM memories WHERE id = ?", [(memory.id,) for memory in memories])
+
+    def compact_memories(self, removed, now=None):
+        """Fold pruned exchanges into day summary rows and roll old summaries up, as the JSON backend does"""
+        rows = self.conn.execute(
+            f"SELECT {MEMORY_COLUMNS} FROM memories m WHERE m.character = ? AND m.level IS NOT NULL",
+            (self.character,)
+        )
+        added, replaced = self.rollup_summaries([self.row_to_memory(row) for row in rows], removed, now)
+        self.delete_memories(replaced)
+        for memory in added:
+            memory.id = self.insert_memory(memory)
+        return added, replaced
+
+    def close(self):
+        """Commit and close the database connection"""
+        self.save_memory()
+        self.conn.close()
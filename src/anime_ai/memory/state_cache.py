@@ -0,0 +1,78 @@
+"""Bounded LRU of loaded character memory states."""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def estimate_memory_bytes(memory):
+    """Rough resident size of one MemoryRecord and its strings"""
+    return 250 + len(memory.user) + len(memory.ai) + 4 * len(memory.keyword_ids)
+
+
+class MemoryStateCache:
+    """Keep recently used character states in memory, bounded by count and bytes.
+
+    Evicted states are handed to ``on_evict`` on a background thread, which
+    is where they get flushed to disk. With ``background=False`` it is called
+    directly instead, for owners that hand the writes to their own writer.
+    """
+
+    def __init__(self, max_entries=4, max_bytes=64 * 1024 * 1024, on_evict=None, background=True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-flush") if background else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def put(self, key, state, size):
+        """Store a state as most recently used, evicting old ones if over budget"""
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (state, size)
+        self.total_bytes += size
+        while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            self.evict()
+
+    def pop(self, key):
+        """Take a state out of the cache, or None if it is not cached"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self.total_bytes -= entry[1]
+        return entry[0]
+
+    def evict(self):
+        """Drop the least recently used state and flush it in the background"""
+        key, (state, size) = self.entries.popitem(last=False)
+        self.total_bytes -= size
+        if self.on_evict is None:
+            return
+        if self.executor is None:
+            self.on_evict(key, state)
+        else:
+            self.pending[key] = self.executor.submit(self.on_evict, key, state)
+
+    def wait(self, key):
+        """Block until a background flush of the given key has finished"""
+        future = self.pending.pop(key, None)
+        if future is not None:
+            future.result()
+
+    def clear(self):
+        """Evict every cached state"""
+        while self.entries:
+            self.evict()
+
+    def close(self):
+        """Flush every cached state and wait for the background writes"""
+        self.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,87 @@
+"""Local extractive summaries of memories, scored by keyword frequency."""
+
+import math
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from .text_classifier import COMMON_WORDS, WORD_PATTERN
+from .time_index import midnight, month_start
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?~♡])\s+')
+
+# Sentences kept per summary, by level
+SUMMARY_LENGTHS = {'day': 3, 'week': 4, 'month': 5}
+# Summaries older than this many days are folded into the next level up
+ROLLUPS = (('day', 'week', 14), ('week', 'month', 60))
+
+
+def split_sentences(text, max_chars=200):
+    """Split text into sentences, trimming very long ones"""
+    sentences = []
+    for sentence in SENTENCE_PATTERN.split(text.replace("\n", " ")):
+        sentence = sentence.strip()
+        if len(WORD_PATTERN.findall(sentence)) >= 2:
+            sentences.append(sentence if len(sentence) <= max_chars else sentence[:max_chars - 1] + "…")
+    return sentences
+
+
+def content_words(sentence):
+    return [word for word in WORD_PATTERN.findall(sentence.lower()) if len(word) > 2 and word not in COMMON_WORDS]
+
+
+def summarize(lines, limit=3):
+    """Pick the ``limit`` most representative (speaker, sentence) lines, in their original order.
+
+    A sentence scores by how frequent its words are across all the lines,
+    divided by the square root of its length so long sentences don't win
+    just by being long.
+    """
+    seen = set()
+    unique_lines = []
+    for speaker, sentence in lines:
+        # Repeated small talk should not fill the summary with copies of one sentence
+        if sentence.lower() not in seen:
+            seen.add(sentence.lower())
+            unique_lines.append((speaker, sentence))
+    lines = unique_lines
+    words = [content_words(sentence) for _, sentence in lines]
+    frequency = Counter(word for sentence in words for word in set(sentence))
+
+    def score(i):
+        unique = set(words[i])
+        return sum(frequency[word] for word in unique) / math.sqrt(len(unique)) if unique else 0.0
+
+    chosen = sorted(range(len(lines)), key=lambda i: (-score(i), i))[:limit]
+    return [lines[i] for i in sorted(chosen)]
+
+
+def summary_lines(memories):
+    """(speaker, sentence) lines of exchanges and of the summaries being folded in"""
+    for memory in memories:
+        if memory.level is None:
+            for sentence in split_sentences(memory.user):
+                yield 'User', sentence
+            for sentence in split_sentences(memory.ai):
+                yield 'You', sentence
+        else:
+            for line in memory.ai.split("\n"):
+                speaker, _, sentence = line.partition(": ")
+                yield speaker, sentence
+
+
+def period_start(epoch, level):
+    """Start of the day, week (from Monday) or month a timestamp falls in"""
+    moment = datetime.fromtimestamp(epoch)
+    if level == 'month':
+        return month_start(moment)
+    if level == 'week':
+        return midnight(moment) - timedelta(days=moment.weekday())
+    return midnight(moment)
+
+
+def summary_title(level, start):
+    if level == 'month':
+        return f"What we talked about in {start:%B %Y}"
+    if level == 'week':
+        return f"What we talked about the week of {start:%B} {start.day}, {start.year}"
+    return f"What we talked about on {start:%A, %B} {start.day}, {start.year}"
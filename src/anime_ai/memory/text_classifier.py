@@ -0,0 +1,164 @@
+"""Single-pass topic, emotion and keyword classification for memories."""
+
+import re
+import time
+from collections import namedtuple
+
+# Word lists per category, grouped the same way as the original regex patterns
+TOPIC_WORDS = {
+    'personal': (
+        ('i', 'me', 'my', 'mine', 'you', 'your', 'yours', 'we', 'us', 'our', 'ours'),
+        ('name', 'age', 'birthday', 'family', 'friend', 'home', 'work', 'school'),
+    ),
+    'activities': (
+        ('play', 'work', 'study', 'read', 'write', 'draw', 'paint', 'sing', 'dance', 'cook', 'eat', 'sleep'),
+        ('game', 'movie', 'music', 'book', 'art', 'sport', 'exercise', 'travel'),
+    ),
+    'time': (
+        ('today', 'tomorrow', 'yesterday', 'morning', 'afternoon', 'evening', 'night'),
+        ('week', 'month', 'year', 'hour', 'minute', 'second', 'time', 'date'),
+    ),
+    'location': (
+        ('home', 'school', 'work', 'office', 'park', 'beach', 'city', 'town', 'country'),
+        ('room', 'house', 'building', 'street', 'road', 'place', 'location'),
+    ),
+}
+
+EMOTION_WORDS = {
+    'happy': (
+        ('happy', 'joy', 'excited', 'glad', 'cheerful', 'delighted', 'pleased'),
+        ('smile', 'laugh', 'fun', 'great', 'wonderful', 'amazing', 'awesome'),
+    ),
+    'sad': (
+        ('sad', 'unhappy', 'depressed', 'down', 'blue', 'miserable', 'gloomy'),
+        ('cry', 'tear', 'upset', 'disappointed', 'sorry', 'regret'),
+    ),
+    'angry': (
+        ('angry', 'mad', 'furious', 'annoyed', 'irritated', 'upset', 'frustrated'),
+        ('hate', 'dislike', 'terrible', 'awful', 'horrible'),
+    ),
+    'neutral': (
+        ('okay', 'fine', 'alright', 'normal', 'usual', 'regular', 'typical'),
+    ),
+}
+
+# Common words to filter out of keywords
+COMMON_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'shall',
+    'should', 'can', 'could', 'may', 'might', 'must', 'i', 'you', 'he',
+    'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'
+})
+
+TOPIC_ORDER = tuple(TOPIC_WORDS)
+EMOTION_ORDER = tuple(EMOTION_WORDS)
+
+WORD_PATTERN = re.compile(r'\w+')
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+Classification = namedtuple('Classification', ['topics', 'emotions', 'keywords'])
+
+
+def _build_lookup(categories):
+    """Map each word to a bitmask of the categories it belongs to"""
+    lookup = {}
+    for bit, groups in enumerate(categories.values()):
+        for group in groups:
+            for word in group:
+                lookup[word] = lookup.get(word, 0) | (1 << bit)
+    return lookup
+
+
+# Built once at import: word -> category bits
+TOPIC_LOOKUP = _build_lookup(TOPIC_WORDS)
+EMOTION_LOOKUP = _build_lookup(EMOTION_WORDS)
+
+
+def _labels(mask, order):
+    return [label for bit, label in enumerate(order) if mask & (1 << bit)]
+
+
+def topics_and_emotions(lowered):
+    """Classify already lowercased text into topic and emotion labels"""
+    topic_mask = 0
+    emotion_mask = 0
+    # A regex \b(word)\b matches exactly when some maximal \w+ run equals the word
+    for token in set(WORD_PATTERN.findall(lowered)):
+        topic_mask |= TOPIC_LOOKUP.get(token, 0)
+        emotion_mask |= EMOTION_LOOKUP.get(token, 0)
+    emotions = _labels(emotion_mask, EMOTION_ORDER)
+    return _labels(topic_mask, TOPIC_ORDER), emotions if emotions else ['neutral']
+
+
+def keywords_from_lowered(lowered):
+    """Extract keywords and two-word phrases from already lowercased text"""
+    words = PUNCTUATION_PATTERN.sub('', lowered).split()
+    keywords = []
+    for i, word in enumerate(words):
+        if word not in COMMON_WORDS and len(word) > 3:
+            keywords.append(word)
+            # Add two-word phrases
+            if i < len(words) - 1:
+                phrase = f"{word} {words[i+1]}"
+                if len(phrase) > 6:
+                    keywords.append(phrase)
+    return list(set(keywords))  # Remove duplicates
+
+
+def classify(text):
+    """Return topics, emotions and keywords of a text from one call"""
+    lowered = text.lower()
+    topics, emotions = topics_and_emotions(lowered)
+    return Classification(topics, emotions, keywords_from_lowered(lowered))
+
+
+def classify_batch(texts):
+    """Classify many texts, e.g. when migrating or re-indexing memories"""
+    return [classify(text) for text in texts]
+
+
+def _legacy_classify(text):
+    """The original per-call regex implementation, kept for benchmarking"""
+    lowered = text.lower()
+    topics = []
+    for topic, groups in TOPIC_WORDS.items():
+        patterns = [r'\b(' + '|'.join(group) + r')\b' for group in groups]
+        if any(re.search(pattern, lowered) for pattern in patterns):
+            topics.append(topic)
+    emotions = []
+    for emotion, groups in EMOTION_WORDS.items():
+        patterns = [r'\b(' + '|'.join(group) + r')\b' for group in groups]
+        if any(re.search(pattern, lowered) for pattern in patterns):
+            emotions.append(emotion)
+    return Classification(topics, emotions if emotions else ['neutral'], keywords_from_lowered(lowered))
+
+
+def benchmark(texts=None, repeat=2000):
+    """Time the compiled classifier against the original regex functions"""
+    texts = texts or [
+        "How are you today? I had a great time at the park with my family!",
+        "I'm feeling a bit down... work was terrible and I hate my boss",
+        "What do you like to do for fun? I love games, music and drawing cats",
+        "Okay, fine. Tell me about yourself and where you live",
+    ]
+    for text in texts:
+        legacy = _legacy_classify(text)
+        compiled = classify(text)
+        assert legacy.topics == compiled.topics and legacy.emotions == compiled.emotions, text
+
+    results = {}
+    for name, func in (('legacy', _legacy_classify), ('compiled', classify)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                func(text)
+        results[name] = (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    timings = benchmark()
+    print(f"legacy:   {timings['legacy']:.2f} us/text")
+    print(f"compiled: {timings['compiled']:.2f} us/text")
+    print(f"speed-up: {timings['legacy'] / timings['compiled']:.1f}x")
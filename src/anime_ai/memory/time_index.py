@@ -0,0 +1,152 @@
+"""Timestamp-sorted memory index and parsing of temporal phrases into windows."""
+
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'couple': 2, 'a couple of': 2,
+    'few': 3, 'a few': 3
+}
+NUMBER = r'\b(\d+|a couple of|a few|couple|few|an?|one|two|three|four|five|six|seven|eight|nine|ten)'
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+# Questions about the past itself ("what did we talk about yesterday?"), as opposed to
+# small talk that merely mentions a time ("how are you today?")
+RECALL = re.compile(
+    r'\b(?:remember|recall|remind|forg[eo]t|talk(?:ed)?|chat(?:ted)?|said|say|told|tell me|mention(?:ed)?|'
+    r'discuss(?:ed)?|did (?:we|i|you)|what happened|what was)\b'
+)
+
+
+def midnight(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_start(moment):
+    return midnight(moment).replace(day=1)
+
+
+def ago(match, now):
+    """"3 days ago", "two weeks ago": the day or span around that point"""
+    amount = NUMBER_WORDS.get(match.group(1), None) or int(match.group(1))
+    days = UNIT_DAYS[match.group(2)]
+    if days == 1:
+        start = midnight(now) - timedelta(days=amount)
+        return start, start + timedelta(days=1)
+    center = midnight(now) - timedelta(days=amount * days)
+    return center - timedelta(days=days / 2), center + timedelta(days=days / 2 + 1)
+
+
+def past(match, now):
+    """"past 3 days", "last few weeks": everything from then until now"""
+    amount = NUMBER_WORDS.get(match.group(1), None) or int(match.group(1))
+    return now - timedelta(days=amount * UNIT_DAYS[match.group(2)]), now
+
+
+def weekday(match, now):
+    """"on tuesday", "last tuesday": the most recent such day before today"""
+    back = (now.weekday() - WEEKDAYS.index(match.group(1))) % 7 or 7
+    start = midnight(now) - timedelta(days=back)
+    return start, start + timedelta(days=1)
+
+
+def last_weekend(match, now):
+    back = (now.weekday() - 5) % 7 or 7
+    start = midnight(now) - timedelta(days=back)
+    return start, start + timedelta(days=2)
+
+
+def last_month(match, now):
+    end = month_start(now)
+    return month_start(end - timedelta(days=1)), end
+
+
+def this_week(match, now):
+    return midnight(now) - timedelta(days=now.weekday()), now
+
+
+def last_week(match, now):
+    end = midnight(now) - timedelta(days=now.weekday())
+    return end - timedelta(days=7), end
+
+
+# Checked in order, so longer phrases come before the ones they contain
+TEMPORAL_PATTERNS = [
+    (r'\bday before yesterday\b', lambda m, now: (midnight(now) - timedelta(days=2), midnight(now) - timedelta(days=1))),
+    (r'\blast night\b', lambda m, now: (midnight(now) - timedelta(hours=6), midnight(now) + timedelta(hours=6))),
+    (r'\byesterday\b', lambda m, now: (midnight(now) - timedelta(days=1), midnight(now))),
+    (r'\b(?:today|tonight|this (?:morning|afternoon|evening))\b', lambda m, now: (midnight(now), now)),
+    (NUMBER + r' (day|week|month|year)s? ago\b', ago),
+    (r'\b(?:past|last) ' + NUMBER + r' (day|week|month|year)s?\b', past),
+    (r'\b(?:last|on|this past) (' + '|'.join(WEEKDAYS) + r')\b', weekday),
+    (r'\b(?:last|this past) weekend\b', last_weekend),
+    (r'\bthis week\b', this_week),
+    (r'\blast week\b', last_week),
+    (r'\bthis month\b', lambda m, now: (month_start(now), now)),
+    (r'\blast month\b', last_month),
+    (r'\b(?:recently|lately|the other day)\b', lambda m, now: (now - timedelta(days=7), now)),
+]
+TEMPORAL_PATTERNS = [(re.compile(pattern), window) for pattern, window in TEMPORAL_PATTERNS]
+
+
+def parse_time_window(text, now=None):
+    """Turn the first temporal phrase in a text into a (start, end) epoch window, or None"""
+    lowered = text.lower()
+    now = now or datetime.now()
+    for pattern, window in TEMPORAL_PATTERNS:
+        match = pattern.search(lowered)
+        if match:
+            try:
+                start, end = window(match, now)
+                return start.timestamp(), end.timestamp()
+            except (OverflowError, ValueError, OSError):
+                # Further back than datetime reaches, e.g. "past 5000 years": everything so far
+                return 0.0, now.timestamp()
+    return None
+
+
+def is_recall_question(text):
+    """Whether a text asks about what was said or done, rather than just mentioning a time"""
+    return RECALL.search(text.lower()) is not None
+
+
+class TimeIndex:
+    """Memory ids sorted by timestamp, so a time window is two bisections away"""
+
+    def __init__(self):
+        self.epochs = []
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, memory):
+        """Insert a memory; appending in chronological order is O(1)"""
+        if not self.epochs or memory.epoch >= self.epochs[-1]:
+            self.epochs.append(memory.epoch)
+            self.keys.append(memory.id)
+            return
+        position = bisect_right(self.epochs, memory.epoch)
+        self.epochs.insert(position, memory.epoch)
+        self.keys.insert(position, memory.id)
+
+    def rebuild(self, memories):
+        """Replace the contents with the given memories"""
+        pairs = sorted((memory.epoch, memory.id) for memory in memories)
+        self.epochs = [epoch for epoch, _ in pairs]
+        self.keys = [key for _, key in pairs]
+
+    def sync(self, memories):
+        """Drop every memory that is no longer in the given list"""
+        kept = {memory.id for memory in memories}
+        if len(kept) == len(self.keys):
+            return
+        pairs = [(epoch, key) for epoch, key in zip(self.epochs, self.keys) if key in kept]
+        self.epochs = [epoch for epoch, _ in pairs]
+        self.keys = [key for _, key in pairs]
+
+    def between(self, start, end):
+        """Ids of the memories with start <= timestamp < end, oldest first"""
+        return self.keys[bisect_left(self.epochs, start):bisect_left(self.epochs, end)]
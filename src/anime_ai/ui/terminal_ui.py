@@ -3,6 +3,8 @@
 import time
 import asyncio
 import random
+import threading
+from concurrent.futures import Future
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -31,6 +33,8 @@ class TerminalUI:
     def __init__(self):
         self.console = Console() if RICH_AVAILABLE else None
         self.layout = Layout() if RICH_AVAILABLE else None
+        # Line being read by the background prompt thread, kept when its caller is cancelled
+        self.reader = None
         self.theme_colors = ["bright_magenta", "bright_cyan", "bright_blue", "bright_green"]
         self.current_theme = 0
         self.cassette_frames = [
@@ -43,6 +47,8 @@ class TerminalUI:
             "└─────────────────────────────────────┘"
         ]
         self.cassette_pos = 0
+        # Live display of a reply being streamed, see begin_stream
+        self.stream = None
         self.setup_layout()
         
     def setup_layout(self):
@@ -75,6 +81,39 @@ class TerminalUI:
                 time.sleep(speed)
             live.update(Text(displayed_text, style=style))
 
+    def begin_stream(self, prefix="", style="bright_cyan"):
+        """Start rendering text that arrives in pieces; the display opens on the first piece"""
+        self.end_stream()
+        self.stream = {'text': prefix, 'style': style, 'live': None, 'started': False}
+
+    def stream_delta(self, text):
+        """Append a piece of streamed text to the display"""
+        stream = self.stream
+        if stream is None:
+            return
+        stream['text'] += text
+        if not RICH_AVAILABLE:
+            if not stream['started']:
+                text = stream['text']
+            print(text, end="", flush=True)
+        else:
+            if stream['live'] is None:
+                stream['live'] = Live(console=self.console, refresh_per_second=20)
+                stream['live'].start()
+            stream['live'].update(Text(stream['text'] + "▋", style=stream['style']))
+        stream['started'] = True
+
+    def end_stream(self):
+        """Finish the streamed text, leaving it on screen without the cursor"""
+        stream, self.stream = self.stream, None
+        if stream is None or not stream['started']:
+            return
+        if stream['live'] is not None:
+            stream['live'].update(Text(stream['text'], style=stream['style']))
+            stream['live'].stop()
+        else:
+            print()
+
     def show_loading_screen(self, steps: List[str]):
         """Show an animated loading screen with progress"""
         if not RICH_AVAILABLE:
@@ -362,6 +401,8 @@ class TerminalUI:
 
     def print_fancy(self, message, style="bright_cyan", panel_title=None):
         """Enhanced printing with animations and effects"""
+        # Only one live display can be active, so close a reply still streaming
+        self.end_stream()
         if not RICH_AVAILABLE:
             print(message)
             return
@@ -387,6 +428,45 @@ class TerminalUI:
         else:
             return input(f"{prompt}: ").strip()
 
+    async def get_user_input_async(self, prompt="Enter command"):
+        """Get user input without blocking the event loop, so background tasks keep running at the prompt.
+
+        The line is read on a daemon thread. If the caller is cancelled, e.g.
+        by Ctrl+C, that thread keeps waiting for the line; the next prompt
+        takes it over instead of starting a second reader.
+        """
+        reader = self.reader
+        if reader is None:
+            reader = Future()
+            # Running futures can't be cancelled, so the thread can always deliver its line
+            reader.set_running_or_notify_cancel()
+
+            def read():
+                try:
+                    reader.set_result(self.get_user_input(prompt))
+                except Exception as e:
+                    reader.set_exception(e)
+
+            self.reader = reader
+            threading.Thread(target=read, daemon=True).start()
+        try:
+            return await asyncio.wrap_future(reader)
+        finally:
+            if reader.done():
+                self.reader = None
+
+    def wait_for_pending_input(self, prompt="Press Enter to exit..."):
+        """Wait for the line of a prompt abandoned with Ctrl+C; False if no prompt is pending"""
+        reader, self.reader = self.reader, None
+        if reader is None or reader.done():
+            return False
+        print(prompt, end="", flush=True)
+        try:
+            reader.result()
+        except Exception:
+            pass
+        return True
+
     def confirm_action(self, prompt_text):
         """Get user confirmation with animated styling"""
         if RICH_AVAILABLE:
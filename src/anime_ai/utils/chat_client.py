@@ -0,0 +1,79 @@
+"""Async OpenAI-compatible chat client with a persistent connection pool."""
+
+import json
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401 - only needed for httpx to speak HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class ChatClientError(Exception):
+    """The chat endpoint answered with an error"""
+
+
+class ChatClient:
+    """Chat completions over one long-lived ``httpx.AsyncClient``.
+
+    Connections are kept alive between turns, so only the first request
+    pays for the TCP and TLS handshakes, and concurrent turns share a small
+    pool instead of each occupying an executor thread. HTTP/2 is used when
+    the ``h2`` package is installed.
+    """
+
+    def __init__(self, api_base, api_key, timeout=60.0, connect_timeout=10.0,
+                 max_connections=10, max_keepalive=5, headers=None):
+        self.client = httpx.AsyncClient(
+            base_url=api_base.rstrip("/") + "/",
+            headers=dict(headers or {}),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            http2=HTTP2_AVAILABLE
+        )
+        self.configure(api_base, api_key)
+
+    def configure(self, api_base, api_key):
+        """Point the client at another endpoint or key, keeping its pool"""
+        self.client.base_url = api_base.rstrip("/") + "/"
+        self.client.headers["Authorization"] = f"Bearer {api_key}"
+
+    async def complete(self, **request):
+        """Return the text of a chat completion"""
+        response = await self.client.post("chat/completions", json=request)
+        if response.status_code >= 400:
+            raise ChatClientError(f"{response.status_code}: {response.text[:200]}")
+        data = response.json()
+        if 'error' in data:
+            raise ChatClientError(str(data['error']))
+        return data['choices'][0]['message']['content']
+
+    async def stream(self, **request):
+        """Yield the text deltas of a streamed chat completion as they arrive"""
+        async with self.client.stream("POST", "chat/completions", json=dict(request, stream=True)) as response:
+            if response.status_code >= 400:
+                body = await response.aread()
+                raise ChatClientError(f"{response.status_code}: {body[:200].decode('utf-8', 'replace')}")
+            # Server-sent events: "data: {...}" lines, ending with "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    return
+                chunk = json.loads(payload)
+                if 'error' in chunk:
+                    raise ChatClientError(str(chunk['error']))
+                choices = chunk.get('choices') or [{}]
+                content = (choices[0].get('delta') or {}).get('content')
+                if content:
+                    yield content
+
+    async def aclose(self):
+        await self.client.aclose()
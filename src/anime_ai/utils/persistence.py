@@ -0,0 +1,87 @@
+"""Debounced background persistence shared by memory and settings writes."""
+
+import atexit
+import threading
+import time
+
+
+class PersistenceWriter:
+    """Run file writes on a dedicated worker thread, coalescing rapid repeats.
+
+    ``schedule(key, fn)`` queues ``fn`` to run once the debounce window has
+    passed. Scheduling the same key again before then replaces the callback
+    without pushing the deadline back, so a burst of writes turns into one
+    flush at most ``delay`` seconds after the first of them.
+    """
+
+    def __init__(self, delay=0.5):
+        self.delay = delay
+        self.tasks = {}
+        self.running = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="persistence-writer", daemon=True)
+        self.thread.start()
+        # Daemon threads are killed at exit, so make sure pending writes land first
+        atexit.register(self.close)
+
+    def schedule(self, key, fn):
+        """Queue a write, replacing any pending write with the same key"""
+        with self.condition:
+            if self.closed:
+                run_now = True
+            else:
+                run_now = False
+                due = self.tasks[key][0] if key in self.tasks else time.monotonic() + self.delay
+                self.tasks[key] = (due, fn)
+                self.condition.notify_all()
+        if run_now:
+            self.execute(fn)
+
+    def run(self):
+        """Worker loop: wait for the earliest deadline and run what is due"""
+        while True:
+            with self.condition:
+                while True:
+                    if self.closed and not self.tasks:
+                        return
+                    now = time.monotonic()
+                    due = [key for key, (deadline, _) in self.tasks.items() if deadline <= now]
+                    if due:
+                        break
+                    timeout = min(deadline for deadline, _ in self.tasks.values()) - now if self.tasks else None
+                    self.condition.wait(timeout)
+                callbacks = [self.tasks.pop(key)[1] for key in due]
+                self.running += 1
+            try:
+                for fn in callbacks:
+                    self.execute(fn)
+            finally:
+                with self.condition:
+                    self.running -= 1
+                    self.condition.notify_all()
+
+    @staticmethod
+    def execute(fn):
+        try:
+            fn()
+        except Exception as e:
+            print(f"Warning: Background write failed: {e}")
+
+    def flush(self, timeout=None):
+        """Make every pending write due now and wait until they have all run"""
+        with self.condition:
+            self.tasks = {key: (0, fn) for key, (_, fn) in self.tasks.items()}
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: not self.tasks and not self.running, timeout)
+
+    def close(self):
+        """Flush pending writes and stop the worker thread"""
+        with self.condition:
+            if self.closed:
+                return
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()